@@ -31,7 +31,7 @@ class Authentication:
                 token_data = schemas.TokenData(email=email, permissions=permissions)
             except JWTError:
                 raise credentials_exception
-            user = user_crud.use_db(db).get_user_by_email(token_data.email)
+            user = user_crud.use_db(db, request=True).get_user_by_email(token_data.email)
             if user is None:
                 raise credentials_exception
             return user
@@ -53,7 +53,7 @@ class Authentication:
         self.get_current_active_superuser = _get_current_active_superuser
 
     def authenticate_user(self, db, email: str, password: str):
-        user = self.user_crud.use_db(db).get_user_by_email(email, include_password=True)
+        user = self.user_crud.use_db(db, request=True).get_user_by_email(email, include_password=True)
         if not user:
             return False
         if not security.verify_password(password, user.hashed_password):
@@ -61,10 +61,10 @@ class Authentication:
         return user
 
     def sign_up_new_user(self, db, email: str, password: str):
-        user = self.user_crud.use_db(db).get_user_by_email(email)
+        user = self.user_crud.use_db(db, request=True).get_user_by_email(email)
         if user:
             return False  # User already exists
-        new_user = self.user_crud.use_db(db).create_user(
+        new_user = self.user_crud.use_db(db, request=True).create_user(
             schemas.UserCreate(
                 email=email,
                 password=password,
@@ -1,65 +1,340 @@
+import contextvars
+import csv
+import io
+import itertools
 from collections import defaultdict
-from typing import List, Dict, Callable
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from typing import List, Dict, Callable, Optional, Type
 
-from fastapi import Request, Depends, Response, APIRouter, Query
+from fastapi import Request, Depends, Response, APIRouter, Query, Body, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import create_model
+from starlette.concurrency import run_in_threadpool
 
+from fastapi_crud_orm_connector.api.json_response import FastJSONResponse, dumps, validated
 from fastapi_crud_orm_connector.api.query_parser import json_parser
+from fastapi_crud_orm_connector.api.response_cache import ResponseCache
 from fastapi_crud_orm_connector.orm.crud import DataSort, DataSortType, Crud
+from fastapi_crud_orm_connector.utils.crud_executor import CrudExecutor, run_crud
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"  # one JSON object per line
+    json = "json"  # a single JSON array
+
+
+STREAM_MEDIA_TYPES = {
+    StreamFormat.ndjson: "application/x-ndjson",
+    StreamFormat.json: "application/json",
+}
+
+
+async def _batches(rows, executor: Optional[CrudExecutor] = None, size: int = 1000):
+    """Groups the rows of ``Crud.iter_all``, reading those of sync cruds in ``executor`` or the default thread pool."""
+    if hasattr(rows, '__aiter__'):
+        batch = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+    rows = iter(rows)
+    run = executor.run if executor is not None else run_in_threadpool
+    # the rows are read with the session the request bound
+    context = contextvars.copy_context()
+    while True:
+        batch = await run(context.run, lambda: list(itertools.islice(rows, size)))
+        if not batch:
+            return
+        yield batch
+
+
+def _dumps(row: Dict) -> str:
+    # encoded and without its None values, as the rows of the listing route
+    return dumps(row).decode('utf-8')
+
+
+async def _stream(rows, stream_format: StreamFormat, executor: Optional[CrudExecutor] = None):
+    separator = '\n' if stream_format == StreamFormat.ndjson else ','
+    first = True
+    if stream_format == StreamFormat.json:
+        yield '['
+    async for batch in _batches(rows, executor):
+        chunk = separator.join(_dumps(row) for row in batch)
+        if stream_format == StreamFormat.ndjson:
+            yield chunk + '\n'
+        else:
+            yield chunk if first else ',' + chunk
+        first = False
+    if stream_format == StreamFormat.json:
+        yield ']'
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"  # a header row, then one line per row
+    ndjson = "ndjson"  # one JSON object per line
+    arrow = "arrow"  # an Arrow IPC stream, one record batch per read batch
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+
+
+async def _chain(first: List[Dict], batches):
+    if first:
+        yield first
+    async for batch in batches:
+        yield batch
+
+
+def _arrow_schema(schema, names: List[str]):
+    """
+    Arrow schema of the exported columns, typed after the fields of the crud schema rather than inferred from the
+    rows, which a batch of None values or of mixed numbers would get wrong. Other columns are exported as text.
+    """
+    import pyarrow as pa
+
+    # bool before int and datetime before date, their subclasses
+    types = [(bool, pa.bool_()), (int, pa.int64()), (float, pa.float64()), (str, pa.string()), (bytes, pa.binary()),
+             (datetime, pa.timestamp('us')), (date, pa.date32()), (time, pa.time64('us')),
+             (timedelta, pa.duration('us'))]
+    fields = schema.instance.__fields__ if schema is not None else dict()
+    ret = []
+    for name in names:
+        field_type = fields[name].outer_type_ if name in fields else None
+        known = [t for python_type, t in types if isinstance(field_type, type) and issubclass(field_type, python_type)]
+        ret.append(pa.field(name, known[0] if known else pa.string()))
+    return pa.schema(ret)
+
+
+async def _arrow(first: List[Dict], batches, names: List[str], schema=None):
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    arrow_schema = _arrow_schema(schema, names)
+    writer = pa.ipc.new_stream(sink, arrow_schema)
+    async for batch in _chain(first, batches):
+        columns = []
+        for f in arrow_schema:
+            values = [row.get(f.name) for row in batch]
+            if f.type == pa.string():
+                values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            columns.append(pa.array(values, type=f.type))
+        writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=arrow_schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+async def _export(first: List[Dict], batches, export_format: ExportFormat, fields: Optional[List[str]], schema=None):
+    names = fields or (list(first[0].keys()) if first else [])
+    if export_format == ExportFormat.arrow:
+        async for chunk in _arrow(first, batches, names, schema):
+            yield chunk
+        return
+    if export_format == ExportFormat.ndjson:
+        async for batch in _chain(first, batches):
+            yield '\n'.join(_dumps(row) for row in batch) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names, extrasaction='ignore')
+    if names:
+        writer.writeheader()
+    async for batch in _chain(first, batches):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _check_fields(schema, fields: Optional[List[str]]):
+    """Streams and exports skip the response_model, so they only read the fields the schema declares."""
+    unknown = sorted(set(fields or []).difference(schema.instance.__fields__))
+    if unknown:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields {unknown}")
+
+
+def _id_type(schema) -> Type:
+    """Type of the ids of a crud, that of the ``id`` field of its instances when they have one."""
+    field = schema.instance.__fields__.get('id')
+    return field.outer_type_ if field is not None else schema.id_type
 
 
 class DefaultAdminRouter:
-    def __init__(self, crud: Crud):
+    """
+    ``executor`` runs the calls of a sync crud off the event loop, bounding how many run at once, a CrudExecutor of its
+    own by default. Every handler binds its session with ``use_db(db, request=True)``, which only holds for the request,
+    so concurrent calls never share a session.
+    ``cache`` keeps the rendered listing and detail responses until the next write through this router.
+    ``fast_json`` renders the rows the crud already validated straight to bytes, skipping the response_model
+    validation, which the routes still declare for the documentation.
+    """
+
+    def __init__(self, crud: Crud, executor: CrudExecutor = None, cache: ResponseCache = None, fast_json: bool = False):
         self.crud = crud
+        self.executor = executor if executor is not None else CrudExecutor()
+        self.cache = cache
+        self.fast_json = fast_json
+
+    def _render(self, content, headers: Dict[str, str] = None):
+        # rows the crud did not validate (orm objects, frames) go through the response_model
+        if self.fast_json and validated(content):
+            return FastJSONResponse(content, headers=headers)
+        return content
+
+    def _cache_key(self, route: str, *params) -> Optional[str]:
+        return self.cache.key(route, *params) if self.cache is not None else None
+
+    async def _write(self, function: Callable, *args):
+        try:
+            return await run_crud(self.executor, function, *args)
+        finally:
+            # also after a failure, which may have written part of a bulk
+            if self.cache is not None:
+                self.cache.invalidate()
 
     def get_all(self, get_db=None, convert2schema=True) -> Callable:
         async def call(request: Request,
                        response: Response,
                        data_filter=Depends(json_parser(Query('{}', alias='filter'), return_type=Dict)),
-                       data_range=Depends(json_parser(Query('[]', alias='range'), return_type=List, default=[0, 100])),
+                       data_range=Depends(json_parser(Query('[]', alias='range'), return_type=List)),
                        data_sort=Depends(json_parser(Query('[]', alias='sort'), return_type=List)),
                        data_fields=Depends(json_parser(Query('[]', alias='fields'), return_type=List)),
+                       cursor: Optional[str] = Query(None),
+                       stream: Optional[StreamFormat] = Query(None),
                        db=Depends(get_db),
                        ):
-            self.crud.use_db(db)
+            self.crud.use_db(db, request=True)
             params = dict()
             if data_sort and data_sort[0]:
                 params['data_sort'] = DataSort(field=data_sort[0], type=DataSortType[data_sort[1]])
+            if stream is not None:
+                _check_fields(self.crud.schema, data_fields)
+                # rows are written as they are read, the total is not counted; without a range every row is sent
+                offset, limit = (data_range[0], data_range[1] - data_range[0] + 1) if data_range else (0, -1)
+                rows = self.crud.iter_all(data_filter=data_filter, data_sort=params.get('data_sort'), data_fields=data_fields,
+                                          offset=offset, limit=limit)
+                end = offset + limit if limit >= 0 else '*'
+                return StreamingResponse(_stream(rows, stream, self.executor), media_type=STREAM_MEDIA_TYPES[stream],
+                                         headers={"Content-Range": f"{offset}-{end}/*"})
+            data_range = data_range or [0, 100]
             params['limit'] = limit = data_range[1] - data_range[0] + 1
             params['offset'] = offset = data_range[0]
-            get_all_response = self.crud.get_all(data_filter=data_filter, **params, data_fields=data_fields, convert2schema=convert2schema)
+            if cursor is not None:
+                # keyset pagination, an empty cursor asks for the first page
+                params['cursor'] = cursor
+            key = self._cache_key('get_all', data_filter, data_range, data_sort, data_fields, cursor, convert2schema)
+            entry = self.cache.get(key) if key is not None else None
+            if entry is not None:
+                return self.cache.response(request, entry)
+            get_all_response = await run_crud(self.executor, self.crud.get_all, data_filter=data_filter, **params, data_fields=data_fields, convert2schema=convert2schema)
 
             # This is necessary for react-admin to work
-            response.headers["Content-Range"] = f"{offset}-{offset + limit}/{get_all_response.count}"
+            headers = {"Content-Range": f"{offset}-{offset + limit}/{get_all_response.count}"}
+            if get_all_response.next_cursor is not None:
+                headers["X-Next-Cursor"] = get_all_response.next_cursor
+            if key is not None and validated(get_all_response.list):
+                return self.cache.response(request, self.cache.set(key, get_all_response.list, headers))
+
+            response.headers.update(headers)
+            return self._render(get_all_response.list, headers)
+
+        return call
 
-            return get_all_response.list
+    def export(self, get_db=None, filename: str = 'export') -> Callable:
+        """Streams every row matching the filter as a file download, the rows read in batches while they are sent."""
+        async def call(request: Request,
+                       data_filter=Depends(json_parser(Query('{}', alias='filter'), return_type=Dict)),
+                       data_sort=Depends(json_parser(Query('[]', alias='sort'), return_type=List)),
+                       data_fields=Depends(json_parser(Query('[]', alias='fields'), return_type=List)),
+                       export_format: ExportFormat = Query(ExportFormat.csv, alias='format'),
+                       db=Depends(get_db),
+                       ):
+            self.crud.use_db(db, request=True)
+            _check_fields(self.crud.schema, data_fields)
+            sort = DataSort(field=data_sort[0], type=DataSortType[data_sort[1]]) if data_sort and data_sort[0] else None
+            rows = self.crud.iter_all(data_filter=data_filter, data_sort=sort, data_fields=data_fields)
+            batches = _batches(rows, self.executor)
+            # the first batch is read before answering, so a bad filter still gets its error status
+            try:
+                first = await batches.__anext__()
+            except StopAsyncIteration:
+                first = []
+            return StreamingResponse(_export(first, batches, export_format, data_fields, self.crud.schema),
+                                     media_type=EXPORT_MEDIA_TYPES[export_format],
+                                     headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'})
 
         return call
 
     def details(self, get_db=None) -> Callable:
         async def call(request: Request, id: int, db=Depends(get_db)):
-            self.crud.use_db(db)
-            return self.crud.get(id)
+            self.crud.use_db(db, request=True)
+            key = self._cache_key('details', id)
+            entry = self.cache.get(key) if key is not None else None
+            if entry is not None:
+                return self.cache.response(request, entry)
+            ret = await run_crud(self.executor, self.crud.get, id)
+            if key is not None and validated(ret):
+                return self.cache.response(request, self.cache.set(key, ret, dict()))
+            return self._render(ret)
 
         return call
 
     def create(self, get_db=None):
         async def call(request: Request, generic, db=Depends(get_db)):
-            self.crud.use_db(db)
-            return self.crud.create(generic)
+            self.crud.use_db(db, request=True)
+            return self._render(await self._write(self.crud.create, generic))
 
         return call
 
     def edit(self, get_db=None):
         async def call(request: Request, id: int, generic, db=Depends(get_db)):
-            self.crud.use_db(db)
-            return self.crud.edit(id, generic)
+            self.crud.use_db(db, request=True)
+            return self._render(await self._write(self.crud.edit, id, generic))
 
         return call
 
     def delete(self, get_db=None):
         async def call(request: Request, id: int, db=Depends(get_db)):
-            self.crud.use_db(db)
-            self.crud.delete(id)
+            self.crud.use_db(db, request=True)
+            await self._write(self.crud.delete, id)
+            return dict()
+
+        return call
+
+    def bulk_create(self, get_db=None):
+        async def call(request: Request, entries: List[self.crud.schema.create] = Body(...), db=Depends(get_db)):
+            self.crud.use_db(db, request=True)
+            return self._render(await self._write(self.crud.bulk_create, entries))
+
+        return call
+
+    def bulk_edit(self, get_db=None):
+        """Every entry carries the ``id`` of the row it edits next to the new values."""
+        edit = self.crud.schema.edit
+        model = create_model(f'{edit.__name__}WithId', __base__=edit, id=(_id_type(self.crud.schema), ...))
+
+        async def call(request: Request, entries: List[model] = Body(...), db=Depends(get_db)):
+            self.crud.use_db(db, request=True)
+            entries = {e.id: edit(**e.dict(exclude={'id'}, exclude_unset=True)) for e in entries}
+            return self._render(await self._write(self.crud.bulk_edit, entries))
+
+        return call
+
+    def bulk_delete(self, get_db=None):
+        async def call(request: Request, ids: List[_id_type(self.crud.schema)] = Body(...), db=Depends(get_db)):
+            self.crud.use_db(db, request=True)
+            await self._write(self.crud.bulk_delete, ids)
             return dict()
 
         return call
@@ -72,22 +347,38 @@ def configure_crud_router(
         router: DefaultAdminRouter = None,
         arg_map=None,
         include_response_model=True,
+        get_read_db=None,
 ):
+    """``get_read_db`` (e.g. ``RDBSession.get_read_db``) serves the listing and detail routes, defaulting to ``get_db``."""
     if arg_map is None:
         arg_map = dict()
     _arg_map = defaultdict(dict)
     _arg_map.update(arg_map)
 
     crud = router.crud
+    if get_read_db is None:
+        get_read_db = get_db
 
     r.get(url,
           response_model=List[crud.schema.instance] if include_response_model else None,
           response_model_exclude_none=True,
-          **_arg_map['get_all'])(router.get_all(get_db))
+          **_arg_map['get_all'])(router.get_all(get_read_db))
+    # registered before the /{id} routes, which would otherwise take "export" for an id
+    r.get(url + "/export", **_arg_map['export'])(router.export(get_read_db, url.strip('/').replace('/', '_') or 'export'))
     r.get(url + "/{id}",
           response_model=crud.schema.instance if include_response_model else None,
           response_model_exclude_none=True,
-          **_arg_map['details'])(router.details(get_db))
+          **_arg_map['details'])(router.details(get_read_db))
+    # registered before the /{id} routes, which would otherwise take "bulk" for an id
+    r.post(url + "/bulk",
+           response_model=List[crud.schema.instance] if include_response_model else None,
+           response_model_exclude_none=True,
+           **_arg_map['bulk_create'])(router.bulk_create(get_db))
+    r.put(url + "/bulk",
+          response_model=List[crud.schema.instance] if include_response_model else None,
+          response_model_exclude_none=True,
+          **_arg_map['bulk_edit'])(router.bulk_edit(get_db))
+    r.delete(url + "/bulk", response_model_exclude_none=True, **_arg_map['bulk_delete'])(router.bulk_delete(get_db))
     r.post(url,
            response_model=crud.schema.instance if include_response_model else None,
            response_model_exclude_none=True,
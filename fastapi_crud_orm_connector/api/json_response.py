@@ -0,0 +1,54 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        if value.__config__.json_encoders:
+            # the custom encoders apply to the values, which only jsonable_encoder walks
+            return jsonable_encoder(value, by_alias=True, exclude_none=True)
+        return value.dict(by_alias=True, exclude_none=True)
+    return jsonable_encoder(value)
+
+
+def _exclude_none(content):
+    # rows built as dicts drop their None values too, as response_model_exclude_none does
+    if isinstance(content, list):
+        return [_exclude_none(e) for e in content]
+    if isinstance(content, dict):
+        return {k: v for k, v in content.items() if v is not None}
+    return content
+
+
+def validated(content: Any) -> bool:
+    """Whether the content is made of pydantic models and dicts, which ``dumps`` renders as the response_model would."""
+    if isinstance(content, list):
+        return all(isinstance(e, (BaseModel, dict)) for e in content)
+    return content is None or isinstance(content, (BaseModel, dict))
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Renders already validated content (pydantic models, dicts, lists) straight to JSON bytes, with orjson when it is
+    installed, without the response_model validation and the jsonable_encoder pass of the regular routes.
+    """
+    content = _exclude_none(content)
+    if orjson is None:
+        return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
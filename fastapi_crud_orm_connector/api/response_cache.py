@@ -0,0 +1,73 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+from uuid import uuid4
+
+from fastapi import Request, Response
+
+from fastapi_crud_orm_connector.api.json_response import dumps
+from fastapi_crud_orm_connector.utils.cache import LRUCache
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class ResponseCache:
+    """
+    Caches the serialized responses of the listing and detail routes of one crud. Entries are keyed on the normalized
+    query parameters and carry an ETag, so a matching If-None-Match is answered with 304. Every write through the
+    routes of the same crud invalidates all of them.
+
+    ``backend`` is any object with ``get`` and ``set``, the in-process TTL LRU cache by default. A shared one (e.g.
+    an adapter to redis) with a stable ``namespace`` shares the entries and the invalidations between workers.
+    """
+
+    def __init__(self,
+                 backend=None,
+                 maxsize: int = 1024,
+                 ttl: Optional[float] = 60,
+                 routes: Iterable[str] = ('get_all', 'details'),
+                 namespace: str = None,
+                 ):
+        self.backend = backend if backend is not None else LRUCache(maxsize, ttl=ttl)
+        self.routes = set(routes)
+        self.namespace = namespace if namespace is not None else uuid4().hex
+
+    def _version(self) -> str:
+        # a random token rather than a counter, so an evicted version can never bring back older entries
+        key = f'{self.namespace}:version'
+        version = self.backend.get(key)
+        if version is None:
+            version = uuid4().hex
+            self.backend.set(key, version)
+        return version
+
+    def key(self, route: str, *params) -> Optional[str]:
+        """Key of a response of ``route``, None when the route is not cached."""
+        if route not in self.routes:
+            return None
+        return f'{self.namespace}:{self._version()}:{route}:{json.dumps(params, sort_keys=True, default=str)}'
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self.backend.get(key)
+
+    def set(self, key: str, content: Any, headers: Dict[str, str]) -> CachedResponse:
+        body = dumps(content)
+        entry = CachedResponse(body, f'"{hashlib.sha1(body).hexdigest()}"', headers)
+        self.backend.set(key, entry)
+        return entry
+
+    def invalidate(self):
+        self.backend.set(f'{self.namespace}:version', uuid4().hex)
+
+    @staticmethod
+    def response(request: Request, entry: CachedResponse) -> Response:
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = {t.strip() for t in if_none_match.split(',')}
+            if '*' in tags or entry.etag in tags or f'W/{entry.etag}' in tags:
+                return Response(status_code=304, headers=dict(entry.headers, ETag=entry.etag))
+        return Response(entry.body, media_type='application/json', headers=dict(entry.headers, ETag=entry.etag))
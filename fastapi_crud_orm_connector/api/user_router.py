@@ -5,9 +5,14 @@ from fastapi import APIRouter, Request, Depends, Response
 from fastapi_crud_orm_connector.api.auth import Authentication
 from fastapi_crud_orm_connector.orm.user_crud import UserCrud
 from fastapi_crud_orm_connector.schemas import UserCreate, UserEdit
+from fastapi_crud_orm_connector.utils.crud_executor import CrudExecutor, run_crud
 
 
-def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud):
+def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud, executor: CrudExecutor = None):
+    if executor is None:
+        # sync cruds never block the event loop
+        executor = CrudExecutor()
+
     @r.get("/users",
            response_model=List[user_crud.get_schema()],
            response_model_exclude_none=True, )
@@ -17,7 +22,7 @@ def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud
         """
         Get all users
         """
-        users = user_crud.use_db(db).get_users()
+        users = await run_crud(executor, user_crud.use_db(db, request=True).get_users)
         # This is necessary for react-admin to work
         response.headers["Content-Range"] = f"0-9/{users.count}"
         return users.list
@@ -39,7 +44,7 @@ def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud
         """
         Get any user details
         """
-        user = user_crud.use_db(db).get_user(user_id)
+        user = await run_crud(executor, user_crud.use_db(db, request=True).get_user, user_id)
         return user
         # return encoders.jsonable_encoder(
         #     user, skip_defaults=True, exclude_none=True,
@@ -54,7 +59,7 @@ def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud
         """
         Create a new user
         """
-        return user_crud.use_db(db).create_user(user)
+        return await run_crud(executor, user_crud.use_db(db, request=True).create_user, user)
 
     @r.put("/users/{user_id}", response_model=user_crud.get_schema(), response_model_exclude_none=True)
     async def user_edit(request: Request,
@@ -65,7 +70,7 @@ def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud
         """
         Update existing user
         """
-        return user_crud.use_db(db).edit_user(user_id, user)
+        return await run_crud(executor, user_crud.use_db(db, request=True).edit_user, user_id, user)
 
     @r.delete("/users/{user_id}", response_model=user_crud.get_schema(), response_model_exclude_none=True)
     async def user_delete(request: Request,
@@ -75,6 +80,6 @@ def generate_user_router(r: APIRouter, auth: Authentication, user_crud: UserCrud
         """
         Delete existing user
         """
-        return user_crud.use_db(db).delete_user(user_id)
+        return await run_crud(executor, user_crud.use_db(db, request=True).delete_user, user_id)
 
     return r
@@ -0,0 +1,206 @@
+from typing import AsyncIterator, Dict, List, Type, Optional, Union
+
+from fastapi import HTTPException, status
+from pydantic.main import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_crud_orm_connector.orm.crud import DataSort, GetAllResponse, DataGroupBy
+from fastapi_crud_orm_connector.orm.rdb_crud import RDBCrud, CountStrategy, EagerLoad
+from fastapi_crud_orm_connector.utils.pydantic_schema import SchemaBase
+from fastapi_crud_orm_connector.utils.rdb_session import Base
+
+
+class AsyncRDBCrud(RDBCrud):
+    """
+    RDBCrud over an asyncio session (SQLAlchemy 1.4+), every method is a coroutine, so the event loop keeps serving
+    other requests while the queries run. Filters, sorting and pagination are built exactly as in RDBCrud.
+    """
+
+    def __init__(self, model: Base, model_map: Dict[str, Base], schema: SchemaBase = None, db: AsyncSession = None,
+                 count_strategy: CountStrategy = CountStrategy.query, count_cap: int = 10000, bulk_batch_size: int = 1000,
+                 eager_load: Dict[str, EagerLoad] = None, text_search_config: str = 'english'):
+        super().__init__(model, model_map, schema=schema, db=db, count_strategy=count_strategy, count_cap=count_cap,
+                         bulk_batch_size=bulk_batch_size, eager_load=eager_load, text_search_config=text_search_config)
+
+    async def iter_all(self,
+                       data_filter: Dict = None,
+                       data_sort: DataSort = None,
+                       data_fields: List = None,
+                       offset: int = 0,
+                       limit: int = -1,
+                       batch_size: int = 1000
+                       ) -> AsyncIterator[Dict]:
+        query, fields = self._stream_query(data_filter, data_sort, data_fields, offset, limit)
+        result = await self.db.stream(query)
+        async for rows in result.partitions(batch_size):
+            for row in rows:
+                yield dict(zip(fields, row))
+
+    def _select(self, data_fields: Optional[List]):
+        if data_fields is not None:
+            return select(*[getattr(self.model, f) for f in data_fields])
+        return select(self.model)
+
+    def _select_columns(self, columns: List):
+        return select(*columns)
+
+    async def _count(self, query) -> int:
+        return (await self.db.execute(select(func.count()).select_from(query.subquery()))).scalar()
+
+    async def get(self, entry_id: int, convert2schema: Optional[Union[bool, Type[BaseModel]]] = True):
+        ret = (await self.db.execute(self._eager(select(self.model)).filter(self.model.id == entry_id))).scalars().first()
+        if not ret:
+            raise HTTPException(status_code=404, detail="not found")
+        custom_converter = convert2schema
+        if convert2schema is True:
+            custom_converter = self.schema.instance.from_orm
+        return self._calculate_schema(ret, custom_converter)
+
+    async def get_first(self, data_filter: Dict = None, data_fields: List = None, convert2schema: Union[bool, Type[BaseModel]] = True):
+        return (await self.get_all(0, 1, data_filter=data_filter, data_fields=data_fields, convert2schema=convert2schema)).list[0]
+
+    async def get_all(self, offset: int = 0,
+                      limit: int = 25,
+                      data_filter: Dict = None,
+                      data_sort: DataSort = None,
+                      data_fields: List = None,
+                      data_group_by: DataGroupBy = None,
+                      *,
+                      cursor: Optional[str] = None,
+                      convert2schema: Optional[Union[bool, Type[BaseModel]]] = True
+                      ) -> GetAllResponse:
+        if data_group_by is not None:
+            query, names = self._group_query(data_filter, data_sort, data_fields, data_group_by, cursor)
+            page = query if data_group_by.unstack else self._limit(query, offset, limit)
+            total_count = None if data_group_by.unstack else await self._count(query)
+            rows = (await self.db.execute(page)).all()
+            return self._group_response(rows, names, total_count, offset, limit, data_sort, data_group_by, convert2schema)
+
+        query, page, extra, offset = self._page_query(offset, limit, data_filter, data_sort, data_fields, cursor)
+        result = await self.db.execute(page)
+        if data_fields is None and EagerLoad.joined in self.eager_load.values():
+            # joined collections repeat the parent row
+            result = result.unique()
+        rows = result.all() if extra or data_fields is not None else result.scalars().all()
+        ret, tail = self._split_rows(rows, extra, data_fields)
+
+        if self._window_count(cursor) and (tail or offset == 0):
+            # past the last page there is no row to read the total from
+            total_count = tail[0][0] if tail else 0
+        else:
+            total_count = await self._total_count(query, offset, limit, len(ret))
+
+        return self._page_response(ret, tail, total_count, limit, data_sort, data_fields, cursor, convert2schema)
+
+    async def _total_count(self, query, offset: int, limit: int, page_count: int) -> int:
+        if self.count_strategy in (CountStrategy.query, CountStrategy.window):
+            return await self._count(query)
+        # rows known to exist, plus one while the page is full so clients keep paginating
+        seen = offset + page_count + (1 if page_count == limit else 0)
+        if self.count_strategy == CountStrategy.capped:
+            return self._capped_total(await self._count(query.limit(self.count_cap)), seen, page_count)
+        if self.count_strategy == CountStrategy.estimate:
+            if self.db.bind.dialect.name != 'postgresql':
+                return self._capped_total(await self._count(query.limit(self.count_cap)), seen, page_count)
+            estimate = await self.db.run_sync(lambda db: self._plan_rows(db.connection(), query))
+            return self._estimated_total(estimate, seen, page_count)
+        return seen
+
+    async def create(self, entry):
+        db_entry = self.model(**entry.dict())
+        self.db.add(db_entry)
+        await self.db.commit()
+        await self.db.refresh(db_entry)
+        return self.schema.instance.from_orm(db_entry)
+
+    async def get_or_create(self, entry, data_filter: Dict = None):
+        entries = (await self.get_all(0, 1, data_filter=data_filter)).list
+        if len(entries) > 0:
+            return entries[0]
+        return await self.create(entry)
+
+    async def delete(self, entry_id: int):
+        entry = await self.get(entry_id, False)
+        await self.db.delete(entry)
+        await self.db.commit()
+
+    async def edit(self, entry_id: int, entry, commit=True):
+        db_entry = await self.get(entry_id, False)
+        update_data = entry.dict(exclude_unset=True)
+
+        for key, value in update_data.items():
+            setattr(db_entry, key, value)
+
+        if commit:
+            self.db.add(db_entry)
+            await self.db.commit()
+            await self.db.refresh(db_entry)
+        return self.schema.instance.from_orm(db_entry)
+
+    def _select_ids(self, entry_ids: List, data_fields: Optional[List] = None):
+        # the session keeps loaded rows after commit, make sure they are read again
+        for query in super()._select_ids(entry_ids, data_fields):
+            yield query.execution_options(populate_existing=True)
+
+    async def _load(self, entry_ids: List) -> Dict:
+        ret = dict()
+        for query in self._select_ids(entry_ids):
+            result = await self.db.execute(query)
+            if EagerLoad.joined in self.eager_load.values():
+                result = result.unique()
+            ret.update((e.id, e) for e in result.scalars())
+        return ret
+
+    async def bulk_create(self, entries: List) -> List:
+        rows = [self._insert_row(entry) for entry in entries]
+        if self._returning():
+            table = self.model.__table__
+            ret = [None] * len(rows)
+            for positions, batch in self._batches(rows):
+                for i, row in zip(positions, await self.db.execute(table.insert().values(batch).returning(*table.columns))):
+                    ret[i] = row
+            await self.db.commit()
+        else:
+            ids = [None] * len(rows)
+            for positions, batch in self._batches(rows):
+                for i, entry_id in zip(positions, await self._insert_many(batch)):
+                    ids[i] = entry_id
+            await self.db.commit()
+            loaded = await self._load(ids)
+            ret = [loaded[i] for i in ids]
+        return [self.schema.instance.from_orm(e) for e in ret]
+
+    async def _insert_many(self, batch: List[Dict]) -> List:
+        table = self.model.__table__
+        if 'id' in batch[0]:
+            await self.db.execute(table.insert(), batch)
+            return [row['id'] for row in batch]
+        return [(await self.db.execute(table.insert().values(row))).inserted_primary_key[0] for row in batch]
+
+    async def bulk_edit(self, entries: Dict) -> List:
+        ids = list(entries.keys())
+        existing = set()
+        for query in self._select_ids(ids, ['id']):
+            existing.update((await self.db.execute(query)).scalars())
+        if len(existing) < len(set(ids)):
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+        for _, batch in self._batches(self._update_rows(entries)):
+            await self.db.execute(self._update_statement(), batch)
+        await self.db.commit()
+        loaded = await self._load(ids)
+        return [self.schema.instance.from_orm(loaded[i]) for i in ids]
+
+    async def bulk_delete(self, entry_ids: List):
+        entry_ids = list(dict.fromkeys(entry_ids))
+        table = self.model.__table__
+        deleted = 0
+        for start in range(0, len(entry_ids), self.bulk_batch_size):
+            deleted += (await self.db.execute(table.delete().where(table.c.id.in_(entry_ids[start:start + self.bulk_batch_size])))).rowcount
+        if deleted < len(entry_ids):
+            await self.db.rollback()
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+        await self.db.commit()
+
+    async def count(self, data_filter: Dict = None):
+        return await self._count(self._generate_filters(data_filter, select(self.model)))
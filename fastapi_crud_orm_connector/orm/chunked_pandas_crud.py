@@ -0,0 +1,231 @@
+from typing import Dict, Iterator, List, Optional, Type, Union
+
+import pandas as pd
+from fastapi import HTTPException
+from pydantic import BaseModel
+from starlette import status
+
+from fastapi_crud_orm_connector.orm.crud import Crud, GetAllResponse, DataSort, DataGroupBy, MathOperation, DataSimplify, \
+    IndexSpecification
+from fastapi_crud_orm_connector.orm.crud_exceptions import CannotFilterFields
+from fastapi_crud_orm_connector.orm.pandas_crud import PandasCrud, PandasSnapshot
+from fastapi_crud_orm_connector.utils.pandas_io import FileFormat, detect_format, iter_frames
+from fastapi_crud_orm_connector.utils.pydantic_schema import pd2pydantic, PandasSchema
+
+
+class ChunkedPandasCrud(PandasCrud):
+    """
+    Read only PandasCrud over a file larger than memory. Every query streams the file in chunks of ``chunksize`` rows,
+    keeping only the requested page or the partial aggregates, so peak memory is bounded by the chunk size.
+    """
+
+    def __init__(self,
+                 schema: Union[PandasSchema, str],
+                 file_path: str,
+                 column_id: Union[str, bool] = 'id',
+                 chunksize: int = 100000,
+                 file_format: FileFormat = None,
+                 ):
+        self.file_path = file_path
+        self.file_format = file_format or detect_format(file_path)
+        self.chunksize = chunksize
+        self.column_id = column_id if column_id is not None and column_id is not False else None
+        first = next(iter(self._chunks()), pd.DataFrame())
+        if self.column_id is None:
+            self.column_id = first.index.name
+        self.columns = list(first.columns)
+
+        Crud.__init__(self, pd2pydantic(schema, first, column_id=column_id) if isinstance(schema, str) else schema)
+        self.index_types = dict()
+        self.snapshot = PandasSnapshot(pd.DataFrame(columns=self.columns), dict(), 0)
+        self.aggregation_cache = None
+        self.parallel = None
+        self.log = None
+
+    def _chunks(self, fields: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        columns = None if fields is None else [c for c in self.columns if c in set(fields)] or self.columns[:1]
+        return iter_frames(self.file_path, self.file_format, column_id=self.column_id, columns=columns, chunksize=self.chunksize)
+
+    def _fields(self, *groups) -> Optional[List[str]]:
+        """Columns a query needs to read, None meaning all of them."""
+        fields = []
+        for g in groups:
+            if g is None:
+                return None
+            fields.extend(g)
+        return fields
+
+    def get(self, entry_id, convert2schema: Union[bool, Type[BaseModel]] = True):
+        for chunk in self._chunks():
+            if entry_id in chunk.index:
+                ret = chunk.loc[[entry_id], :].reset_index()
+                if convert2schema is False:
+                    return ret
+                return self._calculate_schema(ret, convert2schema)[0]
+        raise HTTPException(status_code=404, detail="not found")
+
+    def get_all(self, offset: int = 0,
+                limit: int = 25,
+                data_filter: Dict = None,
+                data_sort: DataSort = None,
+                data_fields: List = None,
+                data_group_by: DataGroupBy = None,
+                data_parse: Dict = None,
+                data_simplify: List[DataSimplify] = None,
+                minimum_rows_allowed: int = 30,
+                index: IndexSpecification = None,
+                *,
+                weight_column: Optional[str] = None,
+                convert2schema: Union[bool, Type[BaseModel]] = True
+                ) -> GetAllResponse:
+        weighted, column = self._weighting(data_fields, weight_column)
+        _filter = list((data_filter or dict()).keys())
+        _weight = [weight_column] if weight_column else []
+
+        if data_group_by is None and not (index and index.index_converter):
+            _sort = [data_sort.field] if data_sort else []
+            chunks = self._chunks(self._fields(data_fields, _filter, _sort, _weight))
+            return self._get_chunked_page(chunks, offset, limit, data_filter, data_sort, data_fields, data_parse, weighted, column,
+                                          weight_column, convert2schema)
+
+        _group = data_group_by.data_fields if data_group_by is not None else []
+        chunks = self._chunks(self._fields(data_fields, _filter, _group, _weight))
+        ret, _filter_by_index = self._chunked_aggregate(chunks, data_filter, data_fields, data_group_by, minimum_rows_allowed, weighted,
+                                                        column, weight_column)
+        ret = self._post_aggregate(ret, data_sort, data_group_by, data_simplify, minimum_rows_allowed, index, _filter_by_index)
+        return self._get_aggregated_page(ret, offset, limit, data_parse, convert2schema)
+
+    def iter_all(self,
+                 data_filter: Dict = None,
+                 data_sort: DataSort = None,
+                 data_fields: List = None,
+                 offset: int = 0,
+                 limit: int = -1,
+                 batch_size: int = 1000
+                 ) -> Iterator[Dict]:
+        """
+        Yields the matching rows while the file is read, one chunk in memory at a time. A sort needs every row, so
+        the sorted rows are read as a single page.
+        """
+        if data_sort is not None:
+            page = self.get_all(offset, limit, data_filter=data_filter, data_sort=data_sort, data_fields=data_fields).list
+            for e in page:
+                yield e.dict() if isinstance(e, BaseModel) else dict(e)
+            return
+        _filter = list((data_filter or dict()).keys())
+        end = None if limit < 0 else offset + limit
+        seen = 0
+        for chunk in self._chunks(self._fields(data_fields, _filter)):
+            if data_fields is not None and not self._has_columns(chunk, data_fields):
+                raise CannotFilterFields(data_fields)
+            ret = self._filter(chunk, data_filter, self._column, self._indexes(chunk))
+            start, stop = max(offset - seen, 0), len(ret) if end is None else max(end - seen, 0)
+            seen += len(ret)
+            for i in range(start, min(stop, len(ret)), batch_size):
+                page = self._get_page_response(ret.iloc[i:min(i + batch_size, stop)], 0, data_fields, None, None, True).list
+                for e in page:
+                    yield e.dict() if isinstance(e, BaseModel) else dict(e)
+            if end is not None and seen >= end:
+                return
+
+    def _get_chunked_page(self, chunks: Iterator[pd.DataFrame], offset: int, limit: int, data_filter: Optional[Dict],
+                          data_sort: Optional[DataSort], data_fields: Optional[List], data_parse: Optional[Dict], weighted: set,
+                          column, weight_column: Optional[str], convert2schema) -> GetAllResponse:
+        end = None if limit < 0 else offset + limit
+        total_count = 0
+        page = []
+        for chunk in chunks:
+            if data_fields is not None and not self._has_columns(chunk, data_fields):
+                raise CannotFilterFields(data_fields)
+            ret = self._filter(chunk, data_filter, column, {k: v for k, v in self._indexes(chunk).items() if k not in weighted})
+            if data_sort:
+                # keep only the rows that can still make it to the page
+                page = [self._slice(pd.concat(page + [ret]), 0, -1 if end is None else end, data_sort, column)]
+            else:
+                start, stop = max(offset - total_count, 0), len(ret) if end is None else max(end - total_count, 0)
+                if start < stop:
+                    page.append(ret.iloc[start:stop])
+            total_count += len(ret)
+
+        ret = pd.concat(page) if page else pd.DataFrame(columns=self.columns)
+        if data_sort:
+            ret = ret.iloc[offset:]
+        return self._get_page_response(ret, total_count, data_fields, data_parse, weight_column, convert2schema)
+
+    def _chunked_aggregate(self, chunks: Iterator[pd.DataFrame], data_filter: Optional[Dict], data_fields: Optional[List],
+                           data_group_by: Optional[DataGroupBy], minimum_rows_allowed: int, weighted: set, column,
+                           weight_column: Optional[str]):
+        """Aggregates every chunk on its own and merges the partial results; means are kept as sum and count pairs."""
+        operation = data_group_by.operation if data_group_by is not None else None
+        partial_operations = [MathOperation.sum, MathOperation.count] if operation == MathOperation.mean else [operation]
+        merge_operations = {MathOperation.count: MathOperation.sum}
+
+        partials = None
+        rows = []
+        _filter_by_index = None
+        for chunk in chunks:
+            counts = self._group_counts(chunk, data_fields, data_group_by, minimum_rows_allowed, column)
+            if counts is not None:
+                _filter_by_index = counts if _filter_by_index is None else _filter_by_index.add(counts, fill_value=0)
+
+            ret = self._filter(chunk, data_filter, column, {k: v for k, v in self._indexes(chunk).items() if k not in weighted})
+            if data_group_by is None:
+                rows.append(ret)
+                continue
+
+            grouped = self._group(ret, chunk.columns, data_fields, data_group_by, weight_column)
+            current = [self._reduce(grouped, op) for op in partial_operations]
+            if partials is not None:
+                current = [self._reduce(pd.concat([p, c]).groupby(level=list(range(c.index.nlevels))), merge_operations.get(op, op))
+                           for p, c, op in zip(partials, current, partial_operations)]
+            partials = current
+
+        if data_group_by is None:
+            ret = pd.concat(rows) if rows else pd.DataFrame(columns=self.columns)
+            return self._group(ret, ret.columns, data_fields, None, weight_column), _filter_by_index
+
+        if partials is None:
+            ret = pd.DataFrame()
+        elif operation == MathOperation.mean:
+            _sum, _count = partials
+            numeric = _sum.select_dtypes('number').columns
+            ret = _sum[numeric] / _count[numeric]
+        else:
+            ret = partials[0]
+        return self._unstack(ret, data_group_by), _filter_by_index
+
+    def count(self, data_filter: Dict = None):
+        total_count = 0
+        for chunk in self._chunks(list((data_filter or dict()).keys())):
+            total_count += len(self._filter(chunk, data_filter, self._column, self._indexes(chunk), exact=True))
+        return total_count
+
+    def create(self, entry):
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def get_or_create(self, entry, data_filter: Dict = None):
+        entries = self.get_all(data_filter=data_filter).list
+        if len(entries) > 0:
+            return entries[0]
+        return self.create(entry)
+
+    def delete(self, entry_id: int):
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def edit(self, entry_id: int, entry, commit=True):
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def bulk_create(self, entries: List) -> List:
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def bulk_edit(self, entries: Dict) -> List:
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def bulk_delete(self, entry_ids: List):
+        raise HTTPException(status.HTTP_405_METHOD_NOT_ALLOWED, detail="Read only")
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
@@ -1,5 +1,6 @@
+from contextvars import ContextVar
 from enum import Enum
-from typing import Dict, List, Type, Any, Union
+from typing import Dict, Iterator, List, Type, Any, Optional, Union
 
 import pandas as pd
 from pydantic import BaseModel
@@ -52,14 +53,41 @@ class IndexSpecification(BaseModel):
 class GetAllResponse(BaseModel):
     list: Any
     count: int
+    next_cursor: Optional[str] = None
+
+
+# sessions bound to the current request, by crud
+_request_db: ContextVar[Optional[Dict]] = ContextVar('request_db', default=None)
 
 
 class Crud:
+    """
+    ``db`` is the session the crud runs on. ``use_db(db, request=True)`` binds it to the calling context only (the task
+    serving the request and the threads running its calls), so one crud serves concurrent requests, each on its own
+    session. Otherwise, as when assigning ``db``, the session is used by every context that did not bind one.
+    """
+    _db_default = None
+
     def __init__(self, schema: SchemaBase = None):
         self.schema = schema
 
-    def use_db(self, db):
-        self.db = db
+    @property
+    def db(self):
+        bound = _request_db.get()
+        if bound is not None and self in bound:
+            return bound[self]
+        return self._db_default
+
+    @db.setter
+    def db(self, db):
+        self._db_default = db
+
+    def use_db(self, db, request: bool = False):
+        if request:
+            # a new mapping, as the current one may be shared with the context it was copied from
+            _request_db.set({**(_request_db.get() or dict()), self: db})
+        else:
+            self._db_default = db
         return self
 
     def get(self, entry_id: int, convert2schema: Union[bool, Type[BaseModel]] = True):
@@ -86,6 +114,36 @@ class Crud:
                 ) -> GetAllResponse:
         raise NotImplemented()
 
+    def iter_all(self,
+                 data_filter: Dict = None,
+                 data_sort: DataSort = None,
+                 data_fields: List = None,
+                 offset: int = 0,
+                 limit: int = -1,
+                 batch_size: int = 1000
+                 ) -> Iterator[Dict]:
+        """
+        Yields the matching rows as dicts, reading ``batch_size`` of them at a time with ``_page``. A negative ``limit``
+        reads all.
+        """
+        end = None if limit < 0 else offset + limit
+        while end is None or offset < end:
+            size = batch_size if end is None else min(batch_size, end - offset)
+            page = self._page(offset, size, data_filter, data_sort, data_fields)
+            for e in page:
+                yield e.dict() if isinstance(e, BaseModel) else dict(e)
+            if len(page) < size:
+                break
+            offset += size
+
+    def _page(self, offset: int, limit: int, data_filter: Optional[Dict], data_sort: Optional[DataSort],
+              data_fields: Optional[List]) -> List:
+        """
+        A batch of ``iter_all``, which has no use for the total. This reads it with ``get_all``, which also counts the
+        matches: cruds able to read a page without counting override it.
+        """
+        return self.get_all(offset, limit, data_filter=data_filter, data_sort=data_sort, data_fields=data_fields).list
+
     def create(self, entry):
         raise NotImplemented()
 
@@ -95,6 +153,17 @@ class Crud:
     def edit(self, entry_id: int, entry):
         raise NotImplemented()
 
+    def bulk_create(self, entries: List) -> List:
+        return [self.create(entry) for entry in entries]
+
+    def bulk_edit(self, entries: Dict) -> List:
+        """``entries`` maps the id of every row to edit to its new data."""
+        return [self.edit(entry_id, entry) for entry_id, entry in entries.items()]
+
+    def bulk_delete(self, entry_ids: List):
+        for entry_id in entry_ids:
+            self.delete(entry_id)
+
     def count(self, data_filter: Dict = None) -> int:
         raise NotImplemented()
 
@@ -1,8 +1,9 @@
-from typing import Dict, List, Type, Optional, Union
+from typing import Dict, Iterator, List, Type, Optional, Union
 
 from bson import ObjectId
 from fastapi import HTTPException
 from pydantic.main import BaseModel
+from pymongo import UpdateOne
 
 from fastapi_crud_orm_connector.orm.crud import Crud, GetAllResponse, DataSort, DataSortType
 from fastapi_crud_orm_connector.utils.pydantic_schema import SchemaBase
@@ -57,6 +58,29 @@ class MongoDBCrud(Crud):
 
         return GetAllResponse(list=self._calculate_schema(ret, convert2schema), count=total_count)
 
+    def iter_all(self,
+                 data_filter: Dict = None,
+                 data_sort: DataSort = None,
+                 data_fields: List = None,
+                 offset: int = 0,
+                 limit: int = -1,
+                 batch_size: int = 1000
+                 ) -> Iterator[Dict]:
+        """Reads the matching rows with a single cursor, fetching ``batch_size`` of them per round trip, uncounted."""
+        if limit == 0:  # which the cursor would take as no limit
+            return
+        _fields = {f: True for f in data_fields} if data_fields is not None else None
+        ret = self.db[self.model].find(self._process_filter(data_filter), _fields).batch_size(batch_size)
+        if data_sort is not None:
+            ret = ret.sort(data_sort.field, -1 if data_sort.type == DataSortType.DESC else 1)
+        ret = ret.skip(offset)
+        if limit > 0:
+            ret = ret.limit(limit)
+        for r in ret:
+            r['id'] = str(r['_id'])
+            e = self._calculate_schema(r)
+            yield e.dict() if isinstance(e, BaseModel) else dict(e)
+
     def create(self, entry):
         inserted = self.db[self.model].insert_one(entry.dict())
         ret = self.db[self.model].find_one(inserted.inserted_id)
@@ -75,5 +99,27 @@ class MongoDBCrud(Crud):
     def edit(self, entry_id: int, entry, commit=True):
         self.db[self.model].update_one({'_id': ObjectId(entry_id)}, {'$set': entry})
 
+    def bulk_create(self, entries: List) -> List:
+        inserted = self.db[self.model].insert_many([entry.dict() for entry in entries])
+        ret = {r['_id']: r for r in self.db[self.model].find({'_id': {'$in': inserted.inserted_ids}})}
+        ret = [ret[i] for i in inserted.inserted_ids]
+        for r in ret:
+            r['id'] = str(r['_id'])
+        return [self.schema.instance(**r) for r in ret]
+
+    def bulk_edit(self, entries: Dict) -> List:
+        requests = [UpdateOne({'_id': ObjectId(entry_id)}, {'$set': entry.dict(exclude_unset=True)}) for entry_id, entry in entries.items()]
+        if requests:
+            self.db[self.model].bulk_write(requests, ordered=False)
+        ids = [ObjectId(entry_id) for entry_id in entries.keys()]
+        ret = {r['_id']: r for r in self.db[self.model].find({'_id': {'$in': ids}})}
+        ret = [ret[i] for i in ids if i in ret]
+        for r in ret:
+            r['id'] = str(r['_id'])
+        return [self.schema.instance(**r) for r in ret]
+
+    def bulk_delete(self, entry_ids: List):
+        self.db[self.model].delete_many({'_id': {'$in': [ObjectId(entry_id) for entry_id in entry_ids]}})
+
     def count(self, data_filter: Dict = None):
         return self.db[self.model].find(self._process_filter(data_filter)).count()
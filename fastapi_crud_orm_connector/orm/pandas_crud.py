@@ -1,5 +1,8 @@
-from typing import Dict, List, Union, Type, Optional
+import json
+from threading import RLock
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Union, Type, Optional
 
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException
 from pydantic import BaseModel
@@ -8,29 +11,172 @@ from starlette import status
 from fastapi_crud_orm_connector.orm.crud import Crud, GetAllResponse, DataSort, DataSortType, DataGroupBy, MathOperation, DataSimplify, \
     IndexSpecification
 from fastapi_crud_orm_connector.orm.crud_exceptions import CannotFilterFields, CannotGroupBy, CannotNormalize
+from fastapi_crud_orm_connector.orm.pandas_index import IndexType, ColumnIndex, LabelIndex, FilterOperation, RANGE_OPERATORS, \
+    build_index
+from fastapi_crud_orm_connector.orm.pandas_parallel import ParallelGroupBy
+from fastapi_crud_orm_connector.utils.append_log import AppendLog, Compactor, Durability
+from fastapi_crud_orm_connector.utils.cache import LRUCache
+from fastapi_crud_orm_connector.utils.pandas_io import FileFormat, detect_format, read_frame, write_frame, iter_frames
 from fastapi_crud_orm_connector.utils.pydantic_schema import pd2pydantic, PandasSchema
 
 
+class PandasSnapshot(NamedTuple):
+    """
+    Immutable version of the dataset with its indexes; writers publish a new one instead of changing it. ``delta``
+    holds the rows appended in log durability mode, merged into ``df`` and its indexes by the compaction.
+    """
+    df: pd.DataFrame
+    indexes: Dict[str, ColumnIndex]
+    version: int
+    delta: Optional[pd.DataFrame] = None
+
+
 class PandasCrud(Crud):
+    """
+    ``lazy_columns`` loads a Parquet or Feather dataset with its id and indexed columns only, reading every other column
+    from the file the first time a query needs it. The first write loads the columns left.
+    """
+    # columns of the file, and those not read yet
+    _columns = ()
+    _lazy_columns = ()
+    # the last snapshot merged with its delta, and the result
+    _merged_frame = None
+
     def __init__(self,
                  schema: Union[PandasSchema, str],
                  df: pd.DataFrame = None,
                  column_id: Union[str, bool] = 'id',
                  file_path: str = None,
+                 indexes: Dict[str, IndexType] = None,
+                 aggregation_cache_size: int = 0,
+                 file_format: FileFormat = None,
+                 columns: List[str] = None,
+                 durability: Durability = Durability.sync,
+                 compact_interval: float = 60,
+                 compact_records: int = 10000,
+                 parallel: ParallelGroupBy = None,
+                 lazy_columns: bool = False,
                  ):
         if file_path is None and df is None:
             raise Exception('Need either df or file_path')
+        sample = df
         if file_path is not None:
-            df = pd.read_csv(file_path, index_col=column_id)
+            file_format = file_format or detect_format(file_path)
+            if lazy_columns and file_format != FileFormat.csv:
+                sample = next(iter_frames(file_path, file_format, column_id=column_id, columns=columns, chunksize=1000))
+                self._columns = list(sample.columns)
+                self._lazy_columns = [c for c in self._columns if c not in (indexes or dict())]
+                columns = [c for c in self._columns if c not in self._lazy_columns]
+            df = read_frame(file_path, file_format, column_id=column_id, columns=columns)
+            sample = df if sample is None else sample
 
-        super().__init__(pd2pydantic(schema, df, column_id=column_id) if isinstance(schema, str) else schema)
+        super().__init__(pd2pydantic(schema, sample, column_id=column_id) if isinstance(schema, str) else schema)
         super().use_db(df)
         self.column_id = column_id if column_id is not None and column_id is not False else df.index.name
         self.file_path = file_path
+        self.file_format = file_format
+        self.index_types = indexes if indexes is not None else dict()
+        self._group_counts_cache = LRUCache(32)
+        self.snapshot = None
         self.df = df
+        self.aggregation_cache = LRUCache(aggregation_cache_size) if aggregation_cache_size > 0 else None
+        self.parallel = parallel
+
+        self._write_lock = RLock()
+        self.log = None
+        if durability == Durability.log and file_path is not None:
+            self.log = AppendLog(file_path + '.log')
+            self._replay()
+            self.compactor = Compactor(self.log, self.compact, interval=compact_interval, max_records=compact_records)
+            self.compactor.start()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._merged(self.snapshot)
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        if self.index_types and not df.index.is_unique:
+            raise Exception('Indexed columns need a unique index')
+        indexes = {k: build_index(t, self._column(df, k)) for k, t in self.index_types.items()}
+        self._publish(df, {k: v for k, v in indexes.items() if v is not None})
+
+    @property
+    def indexes(self) -> Dict[str, ColumnIndex]:
+        return self.snapshot.indexes
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def _publish(self, df: pd.DataFrame, indexes: Dict[str, ColumnIndex], delta: pd.DataFrame = None):
+        """Swaps in the next snapshot, readers holding the previous one keep a consistent view."""
+        self.snapshot = PandasSnapshot(df, indexes, 0 if self.snapshot is None else self.snapshot.version + 1, delta)
+        self._group_counts_cache.clear()
+
+    def _merged(self, snapshot: PandasSnapshot) -> pd.DataFrame:
+        """The rows of ``snapshot``, its delta included, merged once per snapshot."""
+        if snapshot.delta is None:
+            return snapshot.df
+        merged = self._merged_frame
+        if merged is not None and merged[0] is snapshot:
+            return merged[1]
+        df = snapshot.df.append(snapshot.delta)
+        self._merged_frame = (snapshot, df)
+        return df
+
+    def _filter_snapshot(self, snapshot: PandasSnapshot, data_filter: Optional[Dict], column, weighted: Iterable = (),
+                         exact: bool = False) -> pd.DataFrame:
+        """Filters the indexed rows with their indexes and scans the appended ones, keeping them last."""
+        def indexes(df, built=None):
+            return {k: v for k, v in self._indexes(df, built).items() if k not in weighted}
+
+        ret = self._filter(snapshot.df, data_filter, column, indexes(snapshot.df, snapshot.indexes), exact)
+        if snapshot.delta is None:
+            return ret
+        if not data_filter:
+            return self._merged(snapshot)
+        delta = self._filter(snapshot.delta, data_filter, column, indexes(snapshot.delta), exact)
+        return ret.append(delta) if len(delta) > 0 else ret
+
+    def _existing(self, entry_ids: List) -> List:
+        """The ids among ``entry_ids`` of rows in the dataset, without merging the appended rows."""
+        snapshot = self.snapshot
+        return [i for i in entry_ids if i in snapshot.df.index or (snapshot.delta is not None and i in snapshot.delta.index)]
+
+    def _load_columns(self, fields: Optional[List[str]] = None) -> PandasSnapshot:
+        """Reads the columns of ``fields`` (all of them when None) not loaded yet, returning the snapshot holding them."""
+        missing = [c for c in self._lazy_columns if fields is None or c in fields]
+        if not missing:
+            return self.snapshot
+        with self._write_lock:
+            snapshot = self.snapshot
+            missing = [c for c in self._lazy_columns if fields is None or c in fields]
+            if not missing:
+                return snapshot
+            loaded = read_frame(self.file_path, self.file_format, column_id=self.column_id, columns=missing)
+            # nothing was written yet, so the file holds the same rows in the same order
+            df = snapshot.df.copy(deep=False)
+            for c in missing:
+                df[c] = loaded[c].to_numpy()
+            self._lazy_columns = [c for c in self._lazy_columns if c not in missing]
+            df = df[[c for c in self._columns if c in df.columns] + [c for c in df.columns if c not in self._columns]]
+            # the same data, so the version and the caches keyed on it stay valid
+            self.snapshot = snapshot._replace(df=df)
+            return self.snapshot
+
+    @staticmethod
+    def _query_fields(data_filter: Optional[Dict], data_sort: Optional[DataSort], data_fields: Optional[List], *groups) -> Optional[List[str]]:
+        """Columns a query reads, None meaning all of them."""
+        if data_fields is None:
+            return None
+        fields = list(data_fields) + list((data_filter or dict()).keys()) + ([data_sort.field] if data_sort else [])
+        for g in groups:
+            fields.extend(g)
+        return fields
 
     def get(self, entry_id, convert2schema: Union[bool, Type[BaseModel]] = True):
-        ret = self.df.loc[[entry_id], :].reset_index()
+        ret = self._merged(self._load_columns()).loc[[entry_id], :].reset_index()
         if ret is None:
             raise HTTPException(status_code=404, detail="not found")
         if convert2schema is False:
@@ -52,60 +198,184 @@ class PandasCrud(Crud):
                 convert2schema: Union[bool, Type[BaseModel]] = True
                 ) -> GetAllResponse:
 
-        ret = self.df
-        ret = ret.reset_index()
-        if self.column_id is not None:
-            ret['id'] = ret[self.column_id]
+        fields = None
+        if not (data_simplify or index):
+            fields = self._query_fields(data_filter, data_sort, data_fields, data_group_by.data_fields if data_group_by else [],
+                                        [weight_column] if weight_column else [])
+        snapshot = self._load_columns(fields)
+        weighted, column = self._weighting(data_fields, weight_column)
+
+        if data_group_by is None and not (index and index.index_converter):
+            ret = self._filter_snapshot(snapshot, data_filter, column, weighted)
+            return self._get_page(ret, offset, limit, data_sort, data_fields, data_parse, column, weight_column, convert2schema)
 
+        key = None
+        if self.aggregation_cache is not None and data_parse is None:
+            key = self._aggregation_key(snapshot.version, data_filter, data_sort, data_fields, data_group_by, data_simplify, minimum_rows_allowed, index,
+                                        weight_column)
+        ret = self.aggregation_cache.get(key) if key is not None else None
+        if ret is None:
+            ret = self._aggregate(snapshot, data_filter, data_sort, data_fields, data_group_by, data_simplify, minimum_rows_allowed, index,
+                                  weighted, column, weight_column)
+            if key is not None:
+                self.aggregation_cache.set(key, ret)
+
+        return self._get_aggregated_page(ret, offset, limit, data_parse, convert2schema, shared=key is not None)
+
+    def iter_all(self,
+                 data_filter: Dict = None,
+                 data_sort: DataSort = None,
+                 data_fields: List = None,
+                 offset: int = 0,
+                 limit: int = -1,
+                 batch_size: int = 1000
+                 ) -> Iterator[Dict]:
+        """Filters and sorts the snapshot once, then converts ``batch_size`` rows at a time."""
+        snapshot = self._load_columns(self._query_fields(data_filter, data_sort, data_fields))
+        ret = self._filter_snapshot(snapshot, data_filter, self._column)
+        if data_fields is not None and not self._has_columns(ret, data_fields):
+            raise CannotFilterFields(data_fields)
+        ret = self._slice(ret, offset, limit, data_sort, self._column)
+        for start in range(0, len(ret), batch_size):
+            page = self._get_page_response(ret.iloc[start:start + batch_size], len(ret), data_fields, None, None, True).list
+            for e in page:
+                yield e.dict() if isinstance(e, BaseModel) else dict(e)
+
+    def _weighting(self, data_fields: Optional[List], weight_column: Optional[str]):
+        """Returns the weighted fields and a column getter applying the weight to them."""
+        weighted = set()
         if weight_column:
             if data_fields is not None:
-                ret[data_fields] = ret[data_fields].mul(ret[weight_column], axis=0)
+                weighted = set(data_fields)
             # if data_group_by is not None:
             #     ret[data_group_by.data_fields] = ret[data_group_by.data_fields].mul(ret[normalization_column], axis=0)
             else:
                 raise CannotNormalize('Need to specify a data filter for normalization')
 
-        _filter_by_index = None
-        if minimum_rows_allowed and data_group_by:
-            _filter_by_index = ret[data_group_by.data_fields + data_fields].dropna()[data_group_by.data_fields[0]].value_counts()
+        def column(frame, field):
+            ret = self._column(frame, field)
+            return ret.mul(self._column(frame, weight_column)) if field in weighted else ret
+
+        return weighted, column
+
+    def _get_aggregated_page(self, ret: pd.DataFrame, offset: int, limit: int, data_parse: Optional[Dict], convert2schema,
+                             shared: bool = False) -> GetAllResponse:
+        if data_parse is not None:
+            for k, v in data_parse.items():
+                ret[k] = v(ret[k])
+
+        total_count = len(ret)
+        ret = ret.iloc[offset:(len(ret) if limit < 0 else min(offset + limit, len(ret)))]
+        if shared and convert2schema is False:
+            # the cached frame is shared between requests
+            ret = ret.copy()
+        return GetAllResponse(list=self._calculate_schema(ret, convert2schema), count=total_count)
+
+    def _aggregate(self, snapshot: PandasSnapshot,
+                   data_filter: Optional[Dict],
+                   data_sort: Optional[DataSort],
+                   data_fields: Optional[List],
+                   data_group_by: Optional[DataGroupBy],
+                   data_simplify: Optional[List[DataSimplify]],
+                   minimum_rows_allowed: int,
+                   index: Optional[IndexSpecification],
+                   weighted: set,
+                   column,
+                   weight_column: Optional[str]) -> pd.DataFrame:
+        _filter_by_index = self._cached_group_counts(snapshot, data_fields, data_group_by, minimum_rows_allowed, column, weight_column)
+        ret = self._filter_snapshot(snapshot, data_filter, column, weighted)
+        ret = self._prepare_group(ret, self._merged(snapshot).columns, data_fields, data_group_by, weight_column)
+        if data_group_by is not None:
+            if self.parallel is not None and len(ret) >= self.parallel.min_rows:
+                partials = self.parallel.map_partitions(ret, data_group_by.data_fields, _reduce_partition, data_fields, data_group_by)
+                fill_value = 0 if data_group_by.operation in (MathOperation.sum, MathOperation.count) else np.nan
+                ret = self.parallel.all_groups(partials.sort_index(), ret, data_group_by.data_fields, fill_value)
+            else:
+                ret = self._reduce(self._groupby(ret, data_fields, data_group_by), data_group_by.operation)
+            ret = self._unstack(ret, data_group_by)
+        return self._post_aggregate(ret, data_sort, data_group_by, data_simplify, minimum_rows_allowed, index, _filter_by_index)
+
+    def _cached_group_counts(self, snapshot: PandasSnapshot, data_fields: Optional[List], data_group_by: Optional[DataGroupBy],
+                             minimum_rows_allowed: int, column, weight_column: Optional[str]) -> Optional[pd.Series]:
+        """Same as ``_group_counts``, computed once per dataset version as it does not depend on the filter."""
+        if not (minimum_rows_allowed and data_group_by):
+            return None
+        key = (snapshot.version, tuple(data_group_by.data_fields), tuple(data_fields), weight_column)
+        ret = self._group_counts_cache.get(key)
+        if ret is None:
+            ret = self._group_counts(self._merged(snapshot), data_fields, data_group_by, minimum_rows_allowed, column)
+            self._group_counts_cache.set(key, ret)
+        return ret
+
+    @staticmethod
+    def _group_counts(df: pd.DataFrame, data_fields: Optional[List], data_group_by: Optional[DataGroupBy], minimum_rows_allowed: int,
+                      column) -> Optional[pd.Series]:
+        """Rows with all grouping and data fields present, per value of the first grouping field."""
+        if not (minimum_rows_allowed and data_group_by):
+            return None
+        _counted = pd.DataFrame({f: column(df, f) for f in data_group_by.data_fields + data_fields})
+        return _counted.dropna()[data_group_by.data_fields[0]].value_counts()
+
+    def _group(self, ret: pd.DataFrame, columns: pd.Index, data_fields: Optional[List], data_group_by: Optional[DataGroupBy],
+               weight_column: Optional[str]):
+        """Narrows and weights the filtered rows, returning them grouped by ``data_group_by`` when given."""
+        ret = self._prepare_group(ret, columns, data_fields, data_group_by, weight_column)
+        return self._groupby(ret, data_fields, data_group_by) if data_group_by is not None else ret
+
+    def _prepare_group(self, ret: pd.DataFrame, columns: pd.Index, data_fields: Optional[List], data_group_by: Optional[DataGroupBy],
+                       weight_column: Optional[str]) -> pd.DataFrame:
+        if data_group_by is not None and data_fields is not None:
+            _needed = set(data_group_by.data_fields + data_fields + [weight_column])
+            ret = ret[[c for c in ret.columns if c in _needed]]
+        ret = self._materialize(ret, data_fields, weight_column)
 
-        if data_filter is not None:
-            for k, v in data_filter.items():
-                if isinstance(v, list):
-                    ret = ret[ret[k].isin(v)]
-                elif isinstance(v, str):
-                    ret = ret[ret[k].astype(str).str.startswith(v)]
-                else:
-                    ret = ret[ret[k] == v]
         if data_group_by is not None:
             if not set(ret.columns).issuperset(set(data_group_by.data_fields)):
                 raise CannotGroupBy(data_group_by.data_fields)
-
-            ret = ret.groupby(data_group_by.data_fields)
-            if data_fields is not None:
-                if not set(self.df.columns).issuperset(set(data_fields)):
-                    raise CannotFilterFields(data_fields)
-                ret = ret[data_fields]
+            if data_fields is not None and not set(columns).issuperset(set(data_fields)):
+                raise CannotFilterFields(data_fields)
         elif data_fields is not None:
             if not set(ret.columns).issuperset(set(data_fields)):
                 raise CannotFilterFields(data_fields)
             ret = ret[data_fields]
+        return ret
 
-        if data_group_by is not None:
-            if data_group_by.operation == MathOperation.sum:
-                ret = ret.sum()
-            elif data_group_by.operation == MathOperation.count:
-                ret = ret.count()
-            elif data_group_by.operation == MathOperation.min:
-                ret = ret.min()
-            elif data_group_by.operation == MathOperation.max:
-                ret = ret.max()
-            elif data_group_by.operation == MathOperation.mean:
-                ret = ret.mean()
-            if data_group_by.unstack:
-                ret = ret.unstack()
-                ret.columns = ret.columns.droplevel()
+    @staticmethod
+    def _groupby(ret: pd.DataFrame, data_fields: Optional[List], data_group_by: DataGroupBy, observed: bool = False):
+        ret = ret.groupby(data_group_by.data_fields, observed=observed)
+        if data_fields is not None:
+            ret = ret[data_fields]
+        return ret
 
+    @staticmethod
+    def _reduce(ret, operation: MathOperation):
+        if operation == MathOperation.sum:
+            ret = ret.sum()
+        elif operation == MathOperation.count:
+            ret = ret.count()
+        elif operation == MathOperation.min:
+            ret = ret.min()
+        elif operation == MathOperation.max:
+            ret = ret.max()
+        elif operation == MathOperation.mean:
+            ret = ret.mean()
+        return ret
+
+    @staticmethod
+    def _unstack(ret, data_group_by: DataGroupBy):
+        if data_group_by.unstack:
+            ret = ret.unstack()
+            ret.columns = ret.columns.droplevel()
+        return ret
+
+    @staticmethod
+    def _post_aggregate(ret: pd.DataFrame,
+                        data_sort: Optional[DataSort],
+                        data_group_by: Optional[DataGroupBy],
+                        data_simplify: Optional[List[DataSimplify]],
+                        minimum_rows_allowed: int,
+                        index: Optional[IndexSpecification],
+                        _filter_by_index: Optional[pd.Series]) -> pd.DataFrame:
         if index and index.index_converter:
             _data_cols = ret.columns
             _ret = ret.join(index.index_converter.mapping.set_index(index.data_field), how='left', on=index.data_field)
@@ -147,24 +417,292 @@ class PandasCrud(Crud):
         if data_sort:
             ret = ret.sort_values(by=data_sort.field, ascending=data_sort.type != DataSortType.ASC)
 
+        return ret
+
+    @staticmethod
+    def _aggregation_key(version: int, *args) -> str:
+        def normalize(v):
+            if isinstance(v, BaseModel):
+                return {k: normalize(i) for k, i in v}
+            if isinstance(v, pd.DataFrame):
+                return int(pd.util.hash_pandas_object(v).sum())
+            if isinstance(v, (list, tuple)):
+                return [normalize(i) for i in v]
+            if isinstance(v, dict):
+                return {str(k): normalize(i) for k, i in v.items()}
+            return v
+
+        return json.dumps([version, normalize(args)], sort_keys=True, default=str)
+
+    def _column(self, df: pd.DataFrame, field: str) -> pd.Series:
+        """Returns a column of ``df``, reading it from the index when it is not a regular column."""
+        if field in df.columns:
+            return df[field]
+        if field == df.index.name or (field == 'index' and df.index.name is None):
+            return df.index.to_series()
+        if field == 'id' and self.column_id is not None:
+            return self._column(df, self.column_id)
+        raise KeyError(field)
+
+    def _has_columns(self, df: pd.DataFrame, fields: List[str]) -> bool:
+        available = set(df.columns)
+        available.add(df.index.name if df.index.name is not None else 'index')
+        if self.column_id is not None:
+            available.add('id')
+        return available.issuperset(set(fields))
+
+    def _indexes(self, df: pd.DataFrame, indexes: Dict[str, ColumnIndex] = None) -> Dict[str, ColumnIndex]:
+        ret = dict(indexes) if indexes is not None else dict()
+        if df.index.is_unique:
+            ret[df.index.name if df.index.name is not None else 'index'] = LabelIndex(df.index)
+            if self.column_id is not None and self.column_id == df.index.name:
+                ret['id'] = ret[self.column_id]
+        return ret
+
+    @staticmethod
+    def _filter_operation(value, exact: bool = False) -> FilterOperation:
+        if isinstance(value, list):
+            return FilterOperation.isin
+        if isinstance(value, dict):
+            unknown = set(value.keys()).difference(RANGE_OPERATORS.keys())
+            if unknown:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"Unknown filter operators {sorted(unknown)}")
+            return FilterOperation.range
+        if isinstance(value, str) and not exact:
+            return FilterOperation.prefix
+        return FilterOperation.eq
+
+    @staticmethod
+    def _filter(df: pd.DataFrame, data_filter: Optional[Dict], column, indexes: Dict[str, ColumnIndex] = None,
+                exact: bool = False) -> pd.DataFrame:
+        """
+        Filters ``df``, answering what it can from ``indexes`` and scanning the remaining keys with a single boolean
+        mask over the already narrowed rows. Returns ``df`` itself when there is nothing to filter.
+        """
+        if not data_filter:
+            return df
+
+        positions = None
+        remaining = []
+        for k, v in data_filter.items():
+            operation = PandasCrud._filter_operation(v, exact)
+            labels = indexes[k].lookup(operation, v) if indexes and k in indexes else None
+            if labels is None:
+                remaining.append((k, operation, v))
+                continue
+            found = df.index.get_indexer(labels) if len(labels) > 0 else np.array([], dtype=int)
+            found = np.unique(found[found >= 0])
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+
+        ret = df if positions is None else df.iloc[positions]
+        if not remaining:
+            return ret
+
+        mask = np.ones(len(ret), dtype=bool)
+        for k, operation, v in remaining:
+            values = column(ret, k)
+            if operation == FilterOperation.isin:
+                mask &= values.isin(v).to_numpy(dtype=bool)
+            elif operation == FilterOperation.prefix:
+                mask &= values.astype(str).str.startswith(v).to_numpy(dtype=bool)
+            elif operation == FilterOperation.range:
+                for op, bound in v.items():
+                    mask &= RANGE_OPERATORS[op](values, bound).to_numpy(dtype=bool)
+            else:
+                mask &= (values == v).to_numpy(dtype=bool)
+        return ret[mask]
+
+    def _index_rows(self, df: pd.DataFrame, indexes: Dict[str, ColumnIndex], labels: List, add: bool):
+        for k, index in list(indexes.items()):
+            values = self._column(df, k)
+            try:
+                if add:
+                    index.add_many(labels, [values.at[label] for label in labels])
+                else:
+                    index.remove_many(labels, [values.at[label] for label in labels])
+            except TypeError:
+                # the new value changed the column type, rebuild the index from scratch
+                index = build_index(self.index_types[k], values)
+                if index is not None:
+                    indexes[k] = index
+                else:
+                    del indexes[k]
+
+    def _materialize(self, df: pd.DataFrame, data_fields: Optional[List], weight_column: Optional[str]) -> pd.DataFrame:
+        """Builds the response frame (index as a column, ``id`` and weights applied) for the given rows only."""
+        ret = df.reset_index()
+        if self.column_id is not None:
+            ret['id'] = ret[self.column_id]
+        if weight_column:
+            ret[data_fields] = ret[data_fields].mul(ret[weight_column], axis=0)
+        return ret
+
+    def _get_page(self, ret: pd.DataFrame, offset: int, limit: int, data_sort: Optional[DataSort], data_fields: Optional[List],
+                  data_parse: Optional[Dict], column, weight_column: Optional[str], convert2schema) -> GetAllResponse:
+        if data_fields is not None and not self._has_columns(ret, data_fields):
+            raise CannotFilterFields(data_fields)
+
+        total_count = len(ret)
+        ret = self._slice(ret, offset, limit, data_sort, column)
+        return self._get_page_response(ret, total_count, data_fields, data_parse, weight_column, convert2schema)
+
+    @staticmethod
+    def _slice(ret: pd.DataFrame, offset: int, limit: int, data_sort: Optional[DataSort], column) -> pd.DataFrame:
+        end = len(ret) if limit < 0 else min(offset + limit, len(ret))
+        if data_sort:
+            order = column(ret, data_sort.field).reset_index(drop=True)
+            order = order.sort_values(ascending=data_sort.type != DataSortType.ASC).index
+            return ret.iloc[order[offset:end]]
+        return ret.iloc[offset:end]
+
+    def _get_page_response(self, ret: pd.DataFrame, total_count: int, data_fields: Optional[List], data_parse: Optional[Dict],
+                           weight_column: Optional[str], convert2schema) -> GetAllResponse:
+        ret = self._materialize(ret, data_fields, weight_column)
+        if data_fields is not None:
+            ret = ret[data_fields]
+
         if data_parse is not None:
             for k, v in data_parse.items():
                 ret[k] = v(ret[k])
 
-        total_count = len(ret)
-        ret = ret.iloc[offset:(len(ret) if limit < 0 else min(offset + limit, len(ret)))]
         return GetAllResponse(list=self._calculate_schema(ret, convert2schema), count=total_count)
 
     def _save(self):
         if self.file_path is not None:
-            self.df.to_csv(self.file_path)
+            self._load_columns()
+            write_frame(self.df, self.file_path, self.file_format)
+
+    def _write(self, record: Dict):
+        if self.log is not None:
+            self.log.append(record)
+            self.compactor.notify()
+        else:
+            self._save()
+
+    def compact(self):
+        """Folds the append log into the dataset file."""
+        if self.log is None:
+            return self._save()
+        with self._write_lock:
+            self.log.rotate()
+            # snapshots are never changed once published, so no copy is needed
+            snapshot = self._load_columns()
+        # the appended rows are merged and indexed here, without holding up the writers
+        df = self._merged(snapshot)
+        if snapshot.delta is not None:
+            indexes = {k: v.copy() for k, v in snapshot.indexes.items()}
+            self._index_rows(df, indexes, list(snapshot.delta.index), add=True)
+            with self._write_lock:
+                current = self.snapshot
+                # an edit or a delete in the meantime already merged them
+                if current.df is snapshot.df:
+                    # rows appended during the merge stay in the delta of the new snapshot
+                    delta = current.delta.iloc[len(snapshot.delta):]
+                    self._publish(df, indexes, delta if len(delta) > 0 else None)
+        write_frame(df, self.file_path, self.file_format)
+        self.log.discard_rotated()
+
+    def close(self):
+        if self.log is not None:
+            self.compactor.stop()
+            self.compact()
+            self.log.close()
+
+    def _replay(self):
+        for record in self.log.replay():
+            if record['op'] == 'create':
+                record = {'op': 'bulk_create', 'entries': [record['entry']]}
+            elif record['op'] == 'edit':
+                record = {'op': 'bulk_edit', 'entries': [[record['id'], record['entry']]]}
+            elif record['op'] == 'delete':
+                record = {'op': 'bulk_delete', 'ids': [record['id']]}
+
+            if record['op'] == 'bulk_create':
+                # the dataset may already hold the records if a compaction was interrupted
+                existing = self._existing([e[self.column_id] for e in record['entries']])
+                if existing:
+                    self._delete_many(existing)
+                self._create_many(record['entries'])
+            elif record['op'] == 'bulk_edit':
+                entries = {k: v for k, v in record['entries'] if self._existing([k])}
+                if entries:
+                    self._edit_many(entries)
+            elif record['op'] == 'bulk_delete':
+                ids = self._existing(record['ids'])
+                if ids:
+                    self._delete_many(ids)
+
+    def _next_indexes(self) -> Dict[str, ColumnIndex]:
+        return {k: v.copy() for k, v in self.indexes.items()}
+
+    def _fold(self):
+        """Merges the appended rows into the indexed frame, before a write that changes existing rows."""
+        snapshot = self.snapshot
+        if snapshot.delta is None:
+            return
+        df, indexes = self._merged(snapshot), self._next_indexes()
+        self._index_rows(df, indexes, list(snapshot.delta.index), add=True)
+        self._publish(df, indexes)
+
+    def _create_many(self, rows: List[Dict]):
+        self._load_columns()
+        new = pd.json_normalize(rows).set_index(self.column_id)
+        snapshot = self.snapshot
+        if self.log is not None:
+            # only the new rows are copied, the merge with the whole frame is left to the compaction
+            self._publish(snapshot.df, snapshot.indexes, new if snapshot.delta is None else snapshot.delta.append(new))
+            return
+        df, indexes = snapshot.df.append(new), self._next_indexes()
+        self._index_rows(df, indexes, list(new.index), add=True)
+        self._publish(df, indexes)
+
+    def _delete_many(self, entry_ids: List):
+        self._load_columns()
+        self._fold()
+        indexes = self._next_indexes()
+        self._index_rows(self.df, indexes, entry_ids, add=False)
+        self._publish(self.df.drop(entry_ids), indexes)
+
+    def _edit_many(self, entries: Dict):
+        """Sets the non null values of ``entries`` (id to data), a column at a time."""
+        self._load_columns()
+        self._fold()
+        labels = list(entries.keys())
+        new = pd.json_normalize(list(entries.values()))
+        new.index = labels
+        indexes = self._next_indexes()
+        self._index_rows(self.df, indexes, labels, add=False)
+        # only the edited columns are copied, the others stay shared with the published snapshot
+        df = self.df.copy(deep=False)
+        for k in new.columns:
+            values = new[k].dropna()
+            if len(values) == 0:
+                continue
+            column = df[k].copy() if k in df.columns else pd.Series(np.nan, index=df.index)
+            if len(values) == 1:
+                column.at[values.index[0]] = values.iloc[0]
+            else:
+                column.loc[values.index] = values.to_numpy()
+            df[k] = column
+        self._index_rows(df, indexes, labels, add=True)
+        self._publish(df, indexes)
+
+    def _create(self, data: Dict):
+        self._create_many([data])
+
+    def _delete(self, entry_id):
+        self._delete_many([entry_id])
+
+    def _edit(self, entry_id, data: Dict):
+        self._edit_many({entry_id: data})
 
     def create(self, entry):
-        if entry.dict()[self.column_id] in self.df.index:
-            raise HTTPException(status.HTTP_409_CONFLICT, detail="Already Exists")
-        new = pd.json_normalize(entry.dict()).set_index(self.column_id)
-        self.df = self.df.append(new)
-        self._save()
+        data = entry.dict()
+        with self._write_lock:
+            if self._existing([data[self.column_id]]):
+                raise HTTPException(status.HTTP_409_CONFLICT, detail="Already Exists")
+            self._create(data)
+            self._write({'op': 'create', 'entry': data})
         return entry
 
     def get_or_create(self, entry, data_filter: Dict = None):
@@ -174,25 +712,56 @@ class PandasCrud(Crud):
         return self.create(entry)
 
     def delete(self, entry_id: int):
-        if entry_id not in self.df.index:
-            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
-        self.df = self.df.drop(entry_id)
-        self._save()
+        with self._write_lock:
+            if entry_id not in self.df.index:
+                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+            self._delete(entry_id)
+            self._write({'op': 'delete', 'id': entry_id})
 
     def edit(self, entry_id: int, entry, commit=True):
-        if entry_id not in self.df.index:
-            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
-        new = pd.json_normalize(entry.dict()).iloc[0].dropna()
-        self.df.loc[entry_id, new.index] = new
-        self._save()
+        data = entry.dict()
+        with self._write_lock:
+            if entry_id not in self.df.index:
+                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+            self._edit(entry_id, data)
+            self._write({'op': 'edit', 'id': entry_id, 'entry': data})
         return self.get(entry_id)
 
-    def count(self, data_filter: Dict = None):
-        ret = self.df
+    def bulk_create(self, entries: List) -> List:
+        rows = [entry.dict() for entry in entries]
+        ids = [row[self.column_id] for row in rows]
+        with self._write_lock:
+            if len(set(ids)) < len(ids) or self._existing(ids):
+                raise HTTPException(status.HTTP_409_CONFLICT, detail="Already Exists")
+            self._create_many(rows)
+            self._write({'op': 'bulk_create', 'entries': rows})
+        return entries
+
+    def bulk_edit(self, entries: Dict) -> List:
+        data = {entry_id: entry.dict() for entry_id, entry in entries.items()}
+        with self._write_lock:
+            if not pd.Index(list(data.keys())).isin(self.df.index).all():
+                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+            self._edit_many(data)
+            self._write({'op': 'bulk_edit', 'entries': [[k, v] for k, v in data.items()]})
+        ret = self.df.loc[list(data.keys())].reset_index()
+        return self._calculate_schema(ret)
+
+    def bulk_delete(self, entry_ids: List):
+        entry_ids = list(dict.fromkeys(entry_ids))
+        with self._write_lock:
+            if not pd.Index(entry_ids).isin(self.df.index).all():
+                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+            self._delete_many(entry_ids)
+            self._write({'op': 'bulk_delete', 'ids': entry_ids})
 
-        if data_filter:
-            for k, v in data_filter.items():
-                ret = ret[ret[k] == v]
+    def count(self, data_filter: Dict = None):
+        snapshot = self._load_columns(list((data_filter or dict()).keys()))
+        ret = self._filter_snapshot(snapshot, data_filter, self._column, exact=True)
 
         total_count = len(ret)
         return total_count
+
+
+def _reduce_partition(partition: pd.DataFrame, data_fields: Optional[List], data_group_by: DataGroupBy):
+    return PandasCrud._reduce(PandasCrud._groupby(partition, data_fields, data_group_by, observed=True), data_group_by.operation)
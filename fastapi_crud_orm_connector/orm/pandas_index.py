@@ -0,0 +1,296 @@
+import logging
+import numbers
+import operator
+from enum import Enum
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class IndexType(str, Enum):
+    hash = "hash"
+    sorted = "sorted"
+
+
+class FilterOperation(str, Enum):
+    eq = "eq"
+    isin = "isin"
+    prefix = "prefix"
+    range = "range"
+
+
+RANGE_OPERATORS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+
+
+def _successor(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with ``prefix``, None when unbounded."""
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def _has_nulls(values: Iterable) -> bool:
+    # pandas matches None and NaN differently depending on the column dtype, those are left to a scan
+    return any(pd.isna(v) for v in values)
+
+
+class ColumnIndex:
+    """Maps the values of one column to the labels of the rows holding them."""
+
+    def lookup(self, operation: FilterOperation, value) -> Optional[np.ndarray]:
+        """Returns the labels matching the filter, or None when this index cannot answer it."""
+        try:
+            if operation == FilterOperation.eq:
+                return self._eq(value)
+            if operation == FilterOperation.isin:
+                return self._isin(value)
+            if operation == FilterOperation.prefix:
+                return self._prefix(value)
+            if operation == FilterOperation.range:
+                return self._range(value)
+        except TypeError:
+            # values not comparable with the indexed keys, let the caller scan the column
+            return None
+        return None
+
+    def add(self, label: Hashable, value):
+        raise NotImplementedError()
+
+    def remove(self, label: Hashable, value):
+        raise NotImplementedError()
+
+    def add_many(self, labels: Iterable[Hashable], values: Iterable):
+        for label, value in zip(labels, values):
+            self.add(label, value)
+
+    def remove_many(self, labels: Iterable[Hashable], values: Iterable):
+        for label, value in zip(labels, values):
+            self.remove(label, value)
+
+    def copy(self) -> 'ColumnIndex':
+        """Copy that can be changed without affecting this index, sharing whatever is never changed in place."""
+        raise NotImplementedError()
+
+    def _eq(self, value) -> Optional[np.ndarray]:
+        return None
+
+    def _isin(self, values: Iterable) -> Optional[np.ndarray]:
+        return None
+
+    def _prefix(self, prefix: str) -> Optional[np.ndarray]:
+        return None
+
+    def _range(self, bounds: Dict[str, Any]) -> Optional[np.ndarray]:
+        return None
+
+
+class LabelIndex(ColumnIndex):
+    """Answers equality and ``isin`` filters on the frame index itself."""
+
+    def __init__(self, index: pd.Index):
+        self._index = index
+
+    def add(self, label: Hashable, value):
+        pass
+
+    def remove(self, label: Hashable, value):
+        pass
+
+    def copy(self) -> 'LabelIndex':
+        return self
+
+    def _eq(self, value) -> np.ndarray:
+        return self._isin([value])
+
+    def _isin(self, values: Iterable) -> Optional[np.ndarray]:
+        if _has_nulls(values):
+            return None
+        return np.array([v for v in values if v in self._index], dtype=object)
+
+
+class HashIndex(ColumnIndex):
+    """
+    Answers equality and ``isin`` filters with dictionary lookups. Changed buckets are kept apart from the shared
+    dictionary of the others, so a copy only copies the changes, folded into a new dictionary once they grow.
+    """
+
+    def __init__(self, values: pd.Series):
+        notna = values.notna().to_numpy()
+        keys = values[notna]
+        # never changed once built, the copies share it
+        self._labels = {k: frozenset(v) for k, v in keys.index.groupby(keys.to_numpy()).items()}
+        # buckets changed since, empty for the removed ones
+        self._changes = dict()
+
+    def _bucket(self, value) -> frozenset:
+        ret = self._changes.get(value)
+        return ret if ret is not None else self._labels.get(value, frozenset())
+
+    def add(self, label: Hashable, value):
+        if not pd.isna(value):
+            self._changes[value] = self._bucket(value) | {label}
+
+    def remove(self, label: Hashable, value):
+        if not pd.isna(value):
+            self._changes[value] = self._bucket(value) - {label}
+
+    def copy(self) -> 'HashIndex':
+        ret = HashIndex.__new__(HashIndex)
+        ret._labels = self._labels
+        ret._changes = dict(self._changes)
+        if len(ret._changes) > max(64, len(ret._labels) // 8):
+            ret._fold()
+        return ret
+
+    def _fold(self):
+        labels = dict(self._labels)
+        for k, v in self._changes.items():
+            if v:
+                labels[k] = v
+            else:
+                labels.pop(k, None)
+        self._labels = labels
+        self._changes = dict()
+
+    def _eq(self, value) -> np.ndarray:
+        if pd.isna(value):
+            return np.array([])
+        return np.array(list(self._bucket(value)))
+
+    def _isin(self, values: Iterable) -> Optional[np.ndarray]:
+        if _has_nulls(values):
+            return None
+        ret = set()
+        for v in values:
+            ret.update(self._bucket(v))
+        return np.array(list(ret))
+
+
+class SortedIndex(ColumnIndex):
+    """Keeps the column values sorted, answering equality, ``isin``, prefix and range filters by bisection."""
+
+    _bounds = {'gt': 'right', 'gte': 'left', 'lt': 'left', 'lte': 'right'}
+
+    def __init__(self, values: pd.Series):
+        notna = values.notna().to_numpy()
+        keys = values[notna]
+        order = np.argsort(keys.to_numpy(), kind='stable')
+        self._keys = keys.to_numpy()[order]
+        self._labels = keys.index.to_numpy()[order]
+        # prefix filters compare the string representation, so null values can match too ('nan', 'None')
+        self._nulls = dict(zip(values.index[~notna], values[~notna].astype(str)))
+        self._strings = pd.api.types.infer_dtype(keys, skipna=True) in ('string', 'empty')
+
+    def add(self, label: Hashable, value):
+        self.add_many([label], [value])
+
+    def add_many(self, labels: Iterable[Hashable], values: Iterable):
+        """Sorts the new keys alone and merges them in one pass, instead of one insertion per row."""
+        labels, values = list(labels), list(values)
+        notna = [not pd.isna(v) for v in values]
+        for label, value, keep in zip(labels, values, notna):
+            if not keep:
+                self._nulls[label] = str(value)
+        keys = [v for v, keep in zip(values, notna) if keep]
+        if not keys:
+            return
+        if self._keys.dtype != object and (self._keys.dtype.kind not in 'biuf' or not all(isinstance(v, numbers.Number) for v in keys)):
+            raise TypeError(f'Cannot add {keys!r} to a {self._keys.dtype} index')
+        new_keys = np.array(keys, dtype=object) if self._keys.dtype == object else np.asarray(keys)
+        new_labels = np.array([label for label, keep in zip(labels, notna) if keep], dtype=self._labels.dtype)
+        order = np.argsort(new_keys, kind='stable')
+        new_keys, new_labels = new_keys[order], new_labels[order]
+        # new keys go after the equal existing ones, as a stable sort of the whole would put them
+        positions = np.searchsorted(self._keys, new_keys, side='right')
+        self._keys = np.insert(self._keys, positions, new_keys)
+        self._labels = np.insert(self._labels, positions, new_labels)
+        self._strings = self._strings and all(isinstance(v, str) for v in keys)
+
+    def remove_many(self, labels: Iterable[Hashable], values: Iterable):
+        labels, values = list(labels), list(values)
+        if len(labels) <= 1:
+            return super().remove_many(labels, values)
+        for label, value in zip(labels, values):
+            if pd.isna(value):
+                self._nulls.pop(label, None)
+        # labels are unique, so every one of them appears at most once among the keys
+        keep = ~np.isin(self._labels, np.array([label for label, value in zip(labels, values) if not pd.isna(value)], dtype=object))
+        self._keys, self._labels = self._keys[keep], self._labels[keep]
+
+    def copy(self) -> 'SortedIndex':
+        # the key and label arrays are rebound on every change, only the nulls are changed in place
+        ret = SortedIndex.__new__(SortedIndex)
+        ret._keys, ret._labels, ret._strings = self._keys, self._labels, self._strings
+        ret._nulls = dict(self._nulls)
+        return ret
+
+    def remove(self, label: Hashable, value):
+        if pd.isna(value):
+            self._nulls.pop(label, None)
+            return
+        lo = self._search(value, 'left')
+        hi = self._search(value, 'right')
+        found = np.flatnonzero(self._labels[lo:hi] == label)
+        if len(found) > 0:
+            self._keys = np.delete(self._keys, lo + found[0])
+            self._labels = np.delete(self._labels, lo + found[0])
+
+    def _search(self, value, side: str) -> int:
+        if self._keys.dtype != object and (self._keys.dtype.kind not in 'biuf' or not isinstance(value, numbers.Number)):
+            # numpy would silently compare a string against numbers, let the caller scan instead
+            raise TypeError(f'Cannot search {value!r} in a {self._keys.dtype} index')
+        return np.searchsorted(self._keys, value, side=side)
+
+    def _slice(self, lo, hi) -> np.ndarray:
+        return self._labels[lo:hi] if lo < hi else self._labels[:0]
+
+    def _eq(self, value) -> np.ndarray:
+        if pd.isna(value):
+            return self._labels[:0]
+        return self._slice(self._search(value, 'left'), self._search(value, 'right'))
+
+    def _isin(self, values: Iterable) -> Optional[np.ndarray]:
+        if _has_nulls(values):
+            return None
+        parts = [self._eq(v) for v in values]
+        return np.unique(np.concatenate(parts)) if parts else self._labels[:0]
+
+    def _prefix(self, prefix: str) -> Optional[np.ndarray]:
+        if not self._strings:
+            return None
+        lo = self._search(prefix, 'left')
+        upper = _successor(prefix)
+        hi = len(self._keys) if upper is None else self._search(upper, 'left')
+        nulls = [label for label, r in self._nulls.items() if r.startswith(prefix)]
+        ret = self._slice(lo, hi)
+        return np.concatenate([ret, np.array(nulls, dtype=ret.dtype)]) if nulls else ret
+
+    def _range(self, bounds: Dict[str, Any]) -> np.ndarray:
+        lo, hi = 0, len(self._keys)
+        for op, value in bounds.items():
+            pos = self._search(value, self._bounds[op])
+            if op in ('gt', 'gte'):
+                lo = max(lo, pos)
+            else:
+                hi = min(hi, pos)
+        return self._slice(lo, hi)
+
+
+def build_index(index_type: IndexType, values: pd.Series) -> Optional[ColumnIndex]:
+    """Returns None when the values cannot be indexed, e.g. a sorted index over values of mixed types."""
+    try:
+        if index_type == IndexType.hash:
+            return HashIndex(values)
+        return SortedIndex(values)
+    except TypeError:
+        logging.getLogger(__name__).warning('Cannot build a %s index on %s, its filters scan the column', IndexType(index_type).value, values.name)
+        return None
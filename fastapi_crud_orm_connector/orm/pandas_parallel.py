@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+
+class ParallelGroupBy:
+    """
+    Runs group-by reductions of large frames in a process pool. Rows are partitioned by the hash of their group keys,
+    so every group lives in exactly one partition and the partial results only have to be concatenated.
+    """
+
+    def __init__(self, workers: int = None, min_rows: int = 100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._executor = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            return self._executor
+
+    def partition(self, df: pd.DataFrame, keys: List[str]) -> List[pd.DataFrame]:
+        buckets = pd.util.hash_pandas_object(df[keys], index=False).to_numpy() % self.workers
+        partitions = [df[buckets == i] for i in range(self.workers)]
+        return [p for p in partitions if len(p) > 0]
+
+    def map_partitions(self, df: pd.DataFrame, keys: List[str], function: Callable, *args) -> pd.DataFrame:
+        """Applies ``function(partition, *args)`` to every partition in the pool and concatenates the results."""
+        partitions = self.partition(df, keys)
+        if len(partitions) <= 1:
+            return function(df, *args)
+        futures = [self.executor.submit(function, p, *args) for p in partitions]
+        return pd.concat([f.result() for f in futures])
+
+    @staticmethod
+    def all_groups(ret: pd.DataFrame, df: pd.DataFrame, keys: List[str], fill_value=np.nan) -> pd.DataFrame:
+        """
+        Adds the groups a serial ``groupby(observed=False)`` emits for the unused categories of categorical keys. The
+        partitions are reduced with ``observed=True``, else every partition would emit all of them.
+        """
+        if not any(isinstance(df[k].dtype, pd.CategoricalDtype) for k in keys):
+            return ret
+        levels = [pd.CategoricalIndex(df[k].cat.categories, dtype=df[k].dtype) if isinstance(df[k].dtype, pd.CategoricalDtype)
+                  else ret.index.unique(level=i).sort_values() for i, k in enumerate(keys)]
+        index = pd.MultiIndex.from_product(levels, names=keys) if len(keys) > 1 else levels[0].rename(keys[0])
+        return ret.reindex(index, fill_value=fill_value)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -1,26 +1,151 @@
-from operator import and_
-from typing import Dict, List, Type, Optional, Union
+import base64
+import json
+import operator
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Tuple, Type, Optional, Union
 
+import pandas as pd
 from fastapi import HTTPException, status
 from pydantic.main import BaseModel
-from sqlalchemy import String as ormString
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, Numeric, String as ormString
+from sqlalchemy import and_, bindparam, func, inspect, or_
+from sqlalchemy.ext import baked
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from fastapi_crud_orm_connector.orm.crud import Crud, DataSortType, DataSort, GetAllResponse
+from fastapi_crud_orm_connector.orm.crud import Crud, DataSortType, DataSort, GetAllResponse, DataGroupBy, MathOperation
+from fastapi_crud_orm_connector.orm.crud_exceptions import CannotFilterFields, CannotGroupBy
+from fastapi_crud_orm_connector.utils import typed_json
 from fastapi_crud_orm_connector.utils.pydantic_schema import SchemaBase, orm2pydantic
 from fastapi_crud_orm_connector.utils.rdb_session import Base
 
 
+class CountStrategy(str, Enum):
+    query = "query"  # exact, with a second COUNT query
+    window = "window"  # exact, with count(*) OVER () in the page query
+    capped = "capped"  # exact up to count_cap rows
+    estimate = "estimate"  # planner estimate on postgresql, capped elsewhere
+    none = "none"  # no count, only tells whether there is a next page
+
+
+class EagerLoad(str, Enum):
+    select = "select"  # selectinload, one more IN query per relationship and page
+    joined = "joined"  # joinedload, a LEFT OUTER JOIN in the page query
+
+
+class FilterOperator(str, Enum):
+    contains = "contains"  # case insensitive LIKE '%value%', the default of text columns
+    eq = "eq"  # the default of the other columns
+    isin = "in"  # the default of lists
+    prefix = "prefix"  # LIKE 'value%', served by a btree index (text_pattern_ops on postgresql)
+    lower = "lower"  # case insensitive equality, served by an index on lower(column)
+    fulltext = "fulltext"  # full text search, a tsvector index on postgresql (full_text_match), MATCH elsewhere
+    gt = "gt"
+    gte = "gte"
+    lt = "lt"
+    lte = "lte"
+    between = "between"  # [low, high], both included
+
+
+RANGE_OPERATORS = {
+    FilterOperator.gt: operator.gt,
+    FilterOperator.gte: operator.ge,
+    FilterOperator.lt: operator.lt,
+    FilterOperator.lte: operator.le,
+}
+
+
+class full_text_match(FunctionElement):
+    """
+    Full text match of a column, compiled for each backend. On postgresql it reads
+    ``to_tsvector('<config>', column) @@ plainto_tsquery('<config>', value)``, which a GIN index only serves when built
+    on the same expression, e.g. ``CREATE INDEX ON player USING gin (to_tsvector('english', name))``: the one argument
+    ``to_tsvector`` depends on the session setting, so it cannot be indexed.
+    """
+    name = 'full_text_match'
+
+    def __init__(self, column, value, config: str = 'english'):
+        self.config = config
+        super().__init__(column, value)
+
+
+@compiles(full_text_match)
+def _compile_full_text_match(element, compiler, **kw):
+    column, value = list(element.clauses)
+    return compiler.process(column.match(value), **kw)
+
+
+@compiles(full_text_match, 'postgresql')
+def _compile_full_text_match_postgresql(element, compiler, **kw):
+    column, value = list(element.clauses)
+    config = "'{}'".format(element.config.replace("'", "''"))
+    column, value = compiler.process(column, **kw), compiler.process(value, **kw)
+    return f"to_tsvector({config}, {column}) @@ plainto_tsquery({config}, {value})"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+AGGREGATES = {
+    MathOperation.sum: func.sum,
+    MathOperation.count: func.count,
+    MathOperation.min: func.min,
+    MathOperation.max: func.max,
+    MathOperation.mean: func.avg,
+}
+
+
+class _BakedQuery:
+    """Query like view of a baked query and its parameters, as far as paging and counting need."""
+
+    def __init__(self, db: Session, query: baked.BakedQuery, params: Dict, plain: Callable = None):
+        self.db = db
+        self.query = query
+        self.params = params
+        self.plain = plain
+
+    def all(self):
+        return self.query(self.db).params(**self.params).all()
+
+    def count(self) -> int:
+        return self.query(self.db).params(**self.params).count()
+
+    def limit(self, limit: int) -> '_BakedQuery':
+        return _BakedQuery(self.db, self.query.with_criteria(lambda q: q.limit(limit), limit), self.params, self.plain)
+
+    @property
+    def statement(self):
+        # expanding parameters are only rendered on execution, give the plain query to whoever compiles it
+        return self.plain().statement
+
+
 class RDBCrud(Crud):
-    def __init__(self, model: Base, model_map: Dict[str, Base], schema: SchemaBase = None, db: Session = None):
+    def __init__(self, model: Base, model_map: Dict[str, Base], schema: SchemaBase = None, db: Session = None,
+                 count_strategy: CountStrategy = CountStrategy.query, count_cap: int = 10000, bulk_batch_size: int = 1000,
+                 baked_queries: bool = False, eager_load: Dict[str, EagerLoad] = None,
+                 text_search_config: str = 'english'):
         super().__init__(schema if schema is not None else orm2pydantic(model))
         self.db = db
         self.model = model
         self.model_map = model_map
+        self.count_strategy = count_strategy
+        self.count_cap = count_cap
+        self.bulk_batch_size = bulk_batch_size
+        # postgresql configuration of the fulltext filters, the same as in the expression of their index
+        self.text_search_config = text_search_config
+        # caches the compiled get_all statements by the shape of the query
+        self.baked_queries = baked_queries
+        self._bakery = baked.bakery() if baked_queries else None
+        # relationships serialized by the response schema are loaded with the page instead of once per row
+        if eager_load is None:
+            fields = self.schema.instance.__fields__
+            eager_load = {r.key: EagerLoad.select for r in inspect(model).relationships if r.key in fields}
+        self.eager_load = eager_load
 
     def get(self, entry_id: int, convert2schema: Optional[Union[bool, Type[BaseModel]]] = True):
-        ret = self.db.query(self.model).filter(self.model.id == entry_id).first()
+        ret = self._eager(self.db.query(self.model)).filter(self.model.id == entry_id).first()
         if not ret:
             raise HTTPException(status_code=404, detail="not found")
         custom_converter = convert2schema
@@ -29,53 +154,195 @@ class RDBCrud(Crud):
         return self._calculate_schema(ret, custom_converter)
 
     @staticmethod
-    def _generate_filter(model, field, value):
+    def _filter_operations(model, field, value) -> List[Tuple]:
+        """
+        Returns the operations filtering ``field`` by ``value`` and the values they compare with. A dict value picks
+        the operators explicitly, e.g. ``{"name": {"prefix": "Jo"}, "score": {"gte": 1, "lt": 5}}``, otherwise text
+        columns match anything containing the value and other columns are compared for equality.
+        """
         _inner = getattr(model, field)
-        if hasattr(_inner, 'type'):
+        if not hasattr(_inner, 'type'):
+            return [(None, value)]
+        if isinstance(value, list):
+            return [(FilterOperator.isin, value)]
+        if not isinstance(value, dict):
             if isinstance(_inner.type, ormString):  # text
-                ret = _inner.ilike(f'%{value}%')
-            elif isinstance(value, list):
-                ret = _inner.in_(value)
-            else:  # number
-                ret = _inner == value
-            return ret
+                return [(FilterOperator.contains, f'%{value}%')]
+            return [(FilterOperator.eq, value)]  # number
 
-    def _generate_filters(self, data_filter, query):
-        if data_filter is not None and len(data_filter.keys()) > 0:
+        unknown = set(value.keys()).difference(o.value for o in FilterOperator)
+        if unknown:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"Unknown filter operators {sorted(unknown)}")
+        ret = []
+        for name, operand in value.items():
+            operation = FilterOperator(name)
+            if operation == FilterOperator.between:
+                if not isinstance(operand, list) or len(operand) != 2:
+                    raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="between needs a list of two bounds")
+                # two range conditions, so the bounds are bound parameters of their own
+                ret.extend([(FilterOperator.gte, operand[0]), (FilterOperator.lte, operand[1])])
+            elif operation == FilterOperator.contains:
+                ret.append((operation, f'%{operand}%'))
+            elif operation == FilterOperator.prefix:
+                ret.append((operation, _escape_like(str(operand)) + '%'))
+            elif operation == FilterOperator.lower:
+                ret.append((operation, str(operand).lower()))
+            else:
+                ret.append((operation, operand))
+        return ret
+
+    def _operation_clause(self, _inner, operation: Optional[FilterOperator], value):
+        if operation == FilterOperator.contains:
+            return _inner.ilike(value)
+        if operation == FilterOperator.isin:
+            return _inner.in_(value)
+        if operation == FilterOperator.eq:
+            return _inner == value
+        if operation == FilterOperator.prefix:
+            return _inner.like(value, escape='\\')
+        if operation == FilterOperator.lower:
+            return func.lower(_inner) == value
+        if operation == FilterOperator.fulltext:
+            return full_text_match(_inner, value, self.text_search_config)
+        if operation in RANGE_OPERATORS:
+            return RANGE_OPERATORS[operation](_inner, value)
+
+    def _generate_filter(self, model, field, value):
+        _inner = getattr(model, field)
+        clauses = [self._operation_clause(_inner, operation, v) for operation, v in self._filter_operations(model, field, value)]
+        return and_(*clauses) if len(clauses) > 1 else clauses[0]
+
+    def _filter_plan(self, data_filter) -> List[Tuple]:
+        """Lists the relationship, field, operation and value of every filter."""
+        plan = []
+        for field, value in (data_filter or dict()).items():
+            if isinstance(value, dict) and field in self.model_map:  # relationship filter
+                for sub_field, sub_value in value.items():
+                    plan.extend((field, sub_field) + o for o in self._filter_operations(self.model_map[field], sub_field, sub_value))
+            else:
+                plan.extend((None, field) + o for o in self._filter_operations(self.model, field, value))
+        return plan
+
+    def _generate_filters(self, data_filter, query, plan: List[Tuple] = None, bind: bool = False):
+        """With ``bind`` the values are left as bound parameters, named as in ``_filter_params``."""
+        plan = self._filter_plan(data_filter) if plan is None else plan
+        if len(plan) > 0:
             _filter = []
-            for field, value in data_filter.items():
-                if isinstance(value, dict):  # relationship filter
-                    sub_model = self.model_map[field]
-                    query = query.join(sub_model)
-                    for sub_field, sub_value in value.items():
-                        _filter.append(self._generate_filter(sub_model, sub_field, sub_value))
-                else:
-                    _filter.append(self._generate_filter(self.model, field, value))
+            joined = set()
+            for i, (relationship, field, operation, value) in enumerate(plan):
+                model = self.model
+                if relationship is not None:
+                    model = self.model_map[relationship]
+                    if relationship not in joined:
+                        query = query.join(model)
+                        joined.add(relationship)
+                if bind and not self._is_null(operation, value):
+                    value = bindparam(f'filter_{i}', expanding=operation == FilterOperator.isin)
+                _filter.append(self._operation_clause(getattr(model, field), operation, value))
             query = query.filter(and_(*_filter) if len(_filter) > 1 else _filter[0])
         return query
 
-    def _generate_order_by(self, data_sort, query):
-        if data_sort is not None:
-            if hasattr(self.model, data_sort.field):
-                _inner = getattr(self.model, data_sort.field)
-            elif data_sort.field.count('.') == 1:
-                field_array = data_sort.field.split('.')
-                sub_model, sub_field = self.model_map[field_array[0]], field_array[1]
+    @staticmethod
+    def _is_null(operation: Optional[FilterOperator], value) -> bool:
+        """Equality with None, compiled to ``IS NULL`` rather than bound."""
+        return operation == FilterOperator.eq and value is None
+
+    @classmethod
+    def _filter_params(cls, plan: List[Tuple]) -> Dict:
+        return {f'filter_{i}': value for i, (_, _, operation, value) in enumerate(plan) if not cls._is_null(operation, value)}
+
+    @staticmethod
+    def _joined(plan: List[Tuple]) -> set:
+        """Relationships the filters join."""
+        return {relationship for relationship, _, _, _ in plan if relationship is not None}
+
+    def _sort_column(self, data_sort, query, joined: set = frozenset()):
+        """
+        Returns the query with the joins the sort needs, the sort expression and whether it can be null. Relationships
+        in ``joined`` are already joined by the filters.
+        """
+        if hasattr(self.model, data_sort.field):
+            _inner = getattr(self.model, data_sort.field)
+        elif data_sort.field.count('.') == 1:
+            field_array = data_sort.field.split('.')
+            sub_model, sub_field = self.model_map[field_array[0]], field_array[1]
+            if field_array[0] not in joined:
                 query = query.join(sub_model)
-                _inner = getattr(sub_model, sub_field)
-            else:
-                return query
-            if hasattr(_inner, 'type'):
-                if isinstance(_inner.type, ormString):
-                    _inner = func.lower(_inner)  # lowercase sorting of str
+            _inner = getattr(sub_model, sub_field)
+        else:
+            return query, None, False
+        if not hasattr(_inner, 'type'):
+            return query, None, False
+        nullable = getattr(getattr(_inner, 'expression', None), 'nullable', True)
+        if isinstance(_inner.type, ormString):
+            _inner = func.lower(_inner)  # lowercase sorting of str
+        return query, _inner, nullable
+
+    def _generate_order_by(self, data_sort, query, joined: set = frozenset()):
+        if data_sort is not None:
+            query, _inner, _ = self._sort_column(data_sort, query, joined)
+            if _inner is not None:
                 if data_sort.type == DataSortType.ASC:
                     query = query.order_by(_inner.asc())
                 else:
                     query = query.order_by(_inner.desc())
         return query
 
+    @staticmethod
+    def _encode_cursor(data_sort: Optional[DataSort], value, entry_id) -> str:
+        key = [data_sort.field, data_sort.type.value] if data_sort is not None else None
+        # typed, so a datetime or a Decimal is compared as one and not as its string
+        data = json.dumps([key, value, entry_id], default=typed_json.encode)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(data_sort: Optional[DataSort], cursor: str):
+        try:
+            key, value, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()), object_hook=typed_json.decode)
+        except (ValueError, TypeError):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if key != ([data_sort.field, data_sort.type.value] if data_sort is not None else None):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the sort")
+        return value, entry_id
+
+    def _generate_seek(self, data_sort, query, position=None, joined: set = frozenset()):
+        """
+        Orders by the sort field and ``id``, and keeps only the rows after ``position`` (the sort value and id of the
+        last row read), so deep pages are read from the index instead of skipping ``offset`` rows. Nulls come last
+        when ascending and first when descending, the order a btree index gives in both directions.
+        """
+        _id = self.model.id
+        _inner, nullable = None, False
+        if data_sort is not None:
+            query, _inner, nullable = self._sort_column(data_sort, query, joined)
+        if _inner is None:
+            _inner = _id
+        ascending = data_sort is None or data_sort.type == DataSortType.ASC
+
+        if _inner is _id:
+            query = query.order_by(_id.asc() if ascending else _id.desc())
+        elif ascending:
+            query = query.order_by(_inner.asc().nullslast() if nullable else _inner.asc(), _id.asc())
+        else:
+            query = query.order_by(_inner.desc().nullsfirst() if nullable else _inner.desc(), _id.desc())
+
+        if position is not None:
+            value, entry_id = position
+            if _inner is _id:
+                seek = _id > entry_id if ascending else _id < entry_id
+            elif value is None:
+                seek = and_(_inner.is_(None), _id > entry_id) if ascending else or_(_inner.isnot(None), and_(_inner.is_(None), _id < entry_id))
+            elif ascending:
+                seek = or_(_inner > value, and_(_inner == value, _id > entry_id))
+                if nullable:
+                    seek = or_(seek, _inner.is_(None))
+            else:
+                seek = or_(_inner < value, and_(_inner == value, _id < entry_id))
+            query = query.filter(seek)
+        return query, _inner
+
     def get_first(self, data_filter: Dict = None, data_fields: List = None, convert2schema: Union[bool, Type[BaseModel]] = True):
-        ret = self.db.query(self.model)
+        ret = self._eager(self.db.query(self.model))
         ret = self._generate_filters(data_filter, ret)
 
         if data_fields is not None:
@@ -102,23 +369,226 @@ class RDBCrud(Crud):
                 data_filter: Dict = None,
                 data_sort: DataSort = None,
                 data_fields: List = None,
+                data_group_by: DataGroupBy = None,
                 *,
+                cursor: Optional[str] = None,
                 convert2schema: Optional[Union[bool, Type[BaseModel]]] = True #TODO
                 ) -> GetAllResponse:
-        ret = self.db.query(self.model)
+        """With a ``cursor`` (empty for the first page) the page starts after it instead of at ``offset``."""
+        if data_group_by is not None:
+            query, names = self._group_query(data_filter, data_sort, data_fields, data_group_by, cursor)
+            # unstacked rows are pivoted and paged after the query
+            page = query if data_group_by.unstack else self._limit(query, offset, limit)
+            total_count = None if data_group_by.unstack else query.count()
+            return self._group_response(page.all(), names, total_count, offset, limit, data_sort, data_group_by, convert2schema)
+
+        query, page, extra, offset = self._page_query(offset, limit, data_filter, data_sort, data_fields, cursor)
+        ret, tail = self._split_rows(page.all(), extra, data_fields)
+
+        if self._window_count(cursor) and (tail or offset == 0):
+            # past the last page there is no row to read the total from
+            total_count = tail[0][0] if tail else 0
+        else:
+            total_count = self._total_count(query, offset, limit, len(ret))
+
+        return self._page_response(ret, tail, total_count, limit, data_sort, data_fields, cursor, convert2schema)
+
+    def iter_all(self,
+                 data_filter: Dict = None,
+                 data_sort: DataSort = None,
+                 data_fields: List = None,
+                 offset: int = 0,
+                 limit: int = -1,
+                 batch_size: int = 1000
+                 ) -> Iterator[Dict]:
+        """
+        Streams the matching rows through a server side cursor, ``batch_size`` rows at a time. Only the columns are
+        read, no ORM instances, so memory stays flat whatever the number of rows.
+        """
+        query, fields = self._stream_query(data_filter, data_sort, data_fields, offset, limit)
+        for row in query.yield_per(batch_size):
+            yield dict(zip(fields, row))
+
+    def _stream_query(self, data_filter: Optional[Dict], data_sort: Optional[DataSort], data_fields: Optional[List], offset: int,
+                      limit: int):
+        fields = data_fields
+        if fields is None:
+            # the columns the response schema shows, never those it hides
+            declared = self.schema.instance.__fields__
+            fields = [c.key for c in inspect(self.model).column_attrs if c.key in declared]
+        plan = self._filter_plan(data_filter)
+        query = self._generate_filters(data_filter, self._select(fields), plan)
+        query = self._generate_order_by(data_sort, query, self._joined(plan)).order_by(self.model.id)
+        query = self._limit(query, offset, limit) if offset or limit >= 0 else query
+        return query.execution_options(stream_results=True), fields
+
+    def _select(self, data_fields: Optional[List]):
         if data_fields is not None:
-            q = [getattr(self.model, f) for f in data_fields]
-            ret = self.db.query(*q)
+            return self._select_columns([getattr(self.model, f) for f in data_fields])
+        return self.db.query(self.model)
 
-        # filter
-        ret = self._generate_filters(data_filter, ret)
+    def _select_columns(self, columns: List):
+        return self.db.query(*columns)
+
+    def _group_query(self, data_filter: Optional[Dict], data_sort: Optional[DataSort], data_fields: Optional[List],
+                     data_group_by: DataGroupBy, cursor: Optional[str] = None):
+        """
+        Returns the GROUP BY query of ``data_group_by`` and the names of its columns, the group keys first. Without
+        ``data_fields`` every other column but the primary key is aggregated, only the numeric ones for sum and mean.
+        """
+        if cursor is not None:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Cursor pagination of grouped data is not supported")
+        columns = {c.key: getattr(self.model, c.key) for c in inspect(self.model).column_attrs}
+        keys = data_group_by.data_fields
+        if not set(columns).issuperset(keys):
+            raise CannotGroupBy(keys)
+        if data_group_by.unstack and len(keys) < 2:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Unstacking needs at least two group fields")
+        if data_fields is not None:
+            if not set(columns).issuperset(data_fields):
+                raise CannotFilterFields(data_fields)
+            fields = [f for f in data_fields if f not in keys]
+        else:
+            numeric = data_group_by.operation in (MathOperation.sum, MathOperation.mean)
+            skip = set(keys).union(c.key for c in inspect(self.model).primary_key)
+            fields = [f for f, c in columns.items() if f not in skip and not (numeric and not isinstance(c.type, (Integer, Numeric)))]
+
+        aggregate = AGGREGATES[data_group_by.operation]
+        labels = {f: aggregate(columns[f]).label(f) for f in fields}
+        query = self._generate_filters(data_filter, self._select_columns([columns[k] for k in keys] + list(labels.values())))
+        query = query.group_by(*[columns[k] for k in keys])
+
+        order = []
+        if data_sort is not None and not data_group_by.unstack and data_sort.field in set(keys).union(fields):
+            _inner = labels[data_sort.field] if data_sort.field in labels else columns[data_sort.field]
+            order.append(_inner.asc() if data_sort.type == DataSortType.ASC else _inner.desc())
+        return query.order_by(*order, *[columns[k] for k in keys]), keys + fields
+
+    @staticmethod
+    def _limit(query, offset: int, limit: int):
+        return query.offset(offset) if limit < 0 else query.limit(limit).offset(offset)
+
+    def _group_response(self, rows: List, names: List[str], total_count: Optional[int], offset: int, limit: int,
+                        data_sort: Optional[DataSort], data_group_by: DataGroupBy, convert2schema) -> GetAllResponse:
+        """
+        Builds the response of the grouped rows, pivoting, sorting and paging them here when unstacked. The rows are
+        dicts of the group keys and aggregates, which the entity schema does not describe, unless ``convert2schema``
+        names a model for them.
+        """
+        ret = [dict(zip(names, row)) for row in rows]
+        if data_group_by.unstack:
+            df = pd.DataFrame(ret, columns=names).set_index(data_group_by.data_fields).unstack()
+            df.columns = df.columns.droplevel()
+            df = df.reset_index()
+            if data_sort is not None and data_sort.field in df.columns:
+                df = df.sort_values(by=data_sort.field, ascending=data_sort.type == DataSortType.ASC)
+            total_count = len(df)
+            df = df.iloc[offset:] if limit < 0 else df.iloc[offset:offset + limit]
+            ret = df.astype(object).where(df.notna(), None).to_dict('records')
+        if convert2schema is True:
+            return GetAllResponse(list=ret, count=total_count)
+        return GetAllResponse(list=self._calculate_schema(ret, convert2schema), count=total_count)
+
+    def _load_options(self) -> List:
+        loaders = {EagerLoad.select: selectinload, EagerLoad.joined: joinedload}
+        return [loaders[EagerLoad(how)](getattr(self.model, key)) for key, how in self.eager_load.items()]
 
-        total_count = ret.count()
+    def _eager(self, query):
+        return query.options(*self._load_options()) if self.eager_load else query
+
+    def _page_query(self, offset: int, limit: int, data_filter: Optional[Dict], data_sort: Optional[DataSort],
+                    data_fields: Optional[List], cursor: Optional[str]):
+        """Returns the filtered query to count, the page query, how many helper columns it adds and the actual offset."""
+        if self.baked_queries:
+            return self._baked_page_query(offset, limit, data_filter, data_sort, data_fields, cursor)
+
+        # filter
+        plan = self._filter_plan(data_filter)
+        query = self._generate_filters(data_filter, self._select(data_fields), plan)
 
         # sorting
-        ret = self._generate_order_by(data_sort, ret)
+        position = self._decode_cursor(data_sort, cursor) if cursor else None
+        ret, extra = self._generate_page(query, data_sort, cursor is not None, position, self._joined(plan))
+        if data_fields is None:
+            ret = self._eager(ret)
+        if cursor is not None:
+            offset = 0
+        return query, ret.limit(limit).offset(offset), extra, offset
+
+    def _generate_page(self, query, data_sort: Optional[DataSort], seek: bool, position=None, joined: set = frozenset()):
+        """Sorts the filtered query and adds the helper columns of the window count and the cursor."""
+        extra = []
+        if self.count_strategy == CountStrategy.window and not seek:
+            extra.append(func.count().over().label('total_count'))
+
+        if seek:
+            query, _inner = self._generate_seek(data_sort, query, position, joined)
+            extra.extend([_inner.label('cursor_value'), self.model.id.label('cursor_id')])
+        else:
+            query = self._generate_order_by(data_sort, query, joined)
+
+        if extra:
+            query = query.add_columns(*extra)
+        return query, len(extra)
+
+    def _baked_page_query(self, offset: int, limit: int, data_filter: Optional[Dict], data_sort: Optional[DataSort],
+                          data_fields: Optional[List], cursor: Optional[str]):
+        """
+        Same as ``_page_query``, with statements cached by the shape of the query (filtered fields and operations, which
+        equality filters test for null, sort, fields and cursor) and only the values bound on every call, skipping the expression building and compilation.
+        """
+        plan = self._filter_plan(data_filter)
+        params = self._filter_params(plan)
+        fields = tuple(data_fields) if data_fields is not None else None
+        shape = tuple((relationship, field, operation, self._is_null(operation, value))
+                      for relationship, field, operation, value in plan)
+
+        query = self._bakery(lambda db: db.query(self.model))
+        query.add_criteria(lambda q: self._generate_filters(None, q.with_entities(*[getattr(self.model, f) for f in fields])
+                                                            if fields is not None else q, plan, bind=True), fields, shape)
+
+        position = None
+        if cursor:
+            value, entry_id = self._decode_cursor(data_sort, cursor)
+            position = (None if value is None else bindparam('cursor_value'), bindparam('cursor_id'))
+            params.update(cursor_value=value, cursor_id=entry_id)
+            offset = 0
+        elif cursor is not None:
+            offset = 0
+        params.update(limit=limit, offset=offset)
+        sort = (data_sort.field, data_sort.type) if data_sort is not None else None
+        seek = (cursor is not None, position is not None, position is not None and position[0] is None)
+        joined = self._joined(plan)
+
+        def page(q):
+            q, _ = self._generate_page(q, data_sort, cursor is not None, position, joined)
+            if fields is None:
+                q = self._eager(q)
+            return q.limit(bindparam('limit')).offset(bindparam('offset'))
+
+        ret = query.with_criteria(page, sort, seek, self.count_strategy)
+        extra = (1 if self._window_count(cursor) else 0) + (2 if cursor is not None else 0)
+        count = _BakedQuery(self.db, query, self._filter_params(plan),
+                            lambda: self._generate_filters(data_filter, self._select(data_fields)))
+        return count, _BakedQuery(self.db, ret, params), extra, offset
+
+    def _window_count(self, cursor: Optional[str]) -> bool:
+        # the seek filter would restrict a window count to the rows after the cursor
+        return self.count_strategy == CountStrategy.window and cursor is None
+
+    @staticmethod
+    def _split_rows(rows, extra: int, data_fields: Optional[List]):
+        """Separates the helper columns from the rows."""
+        if not extra:
+            return rows, []
+        return [e[:-extra] if data_fields is not None else e[0] for e in rows], [e[-extra:] for e in rows]
+
+    def _page_response(self, ret, tail, total_count: int, limit: int, data_sort: Optional[DataSort], data_fields: Optional[List],
+                       cursor: Optional[str], convert2schema) -> GetAllResponse:
+        next_cursor = None
+        if cursor is not None and len(ret) == limit:
+            next_cursor = self._encode_cursor(data_sort, tail[-1][-2], tail[-1][-1])
 
-        ret = ret.limit(limit).offset(offset).all()
         if data_fields is not None:
             ret_list = []
             for e in ret:
@@ -130,7 +600,42 @@ class RDBCrud(Crud):
         if convert2schema is True and data_fields is None:
             custom_converter = self.schema.instance.from_orm
 
-        return GetAllResponse(list=self._calculate_schema(ret, custom_converter), count=total_count)
+        return GetAllResponse(list=self._calculate_schema(ret, custom_converter), count=total_count, next_cursor=next_cursor)
+
+    def _total_count(self, query, offset: int, limit: int, page_count: int) -> int:
+        if self.count_strategy in (CountStrategy.query, CountStrategy.window):
+            return query.count()
+        # rows known to exist, plus one while the page is full so clients keep paginating
+        seen = offset + page_count + (1 if page_count == limit else 0)
+        if self.count_strategy == CountStrategy.capped:
+            return self._capped_total(query.limit(self.count_cap).count(), seen, page_count)
+        if self.count_strategy == CountStrategy.estimate:
+            connection = self.db.connection()
+            if connection.dialect.name != 'postgresql':
+                return self._capped_total(query.limit(self.count_cap).count(), seen, page_count)
+            return self._estimated_total(self._plan_rows(connection, query.statement), seen, page_count)
+        return seen
+
+    def _capped_total(self, count: int, seen: int, page_count: int) -> int:
+        """The capped count is exact below the cap, only past it can the rows of the page tell more."""
+        return count if count < self.count_cap else self._estimated_total(count, seen, page_count)
+
+    @staticmethod
+    def _estimated_total(estimate: int, seen: int, page_count: int) -> int:
+        # an empty page, as past the last row, proves nothing about the offset
+        return max(estimate, seen) if page_count > 0 else estimate
+
+    @staticmethod
+    def _plan_rows(connection, statement) -> int:
+        """Row estimate of the postgresql query plan, without running the query."""
+        compiled = statement.compile(dialect=connection.dialect)
+        params = tuple(compiled.params[k] for k in compiled.positiontup) if compiled.positional else compiled.params
+        # a raw string, which the 2.0 style connections of the asyncio sessions only run through exec_driver_sql
+        execute = getattr(connection, 'exec_driver_sql', connection.execute)
+        plan = execute('EXPLAIN (FORMAT JSON) ' + str(compiled), params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
 
     def create(self, entry):
         db_entry = self.model(**entry.dict())
@@ -167,6 +672,94 @@ class RDBCrud(Crud):
             self.db.refresh(db_entry)
         return self.schema.instance.from_orm(db_entry)
 
+    def _returning(self) -> bool:
+        # multi row INSERT ... RETURNING, inserting and reading back a batch in a single round trip
+        return self.db.bind.dialect.name == 'postgresql'
+
+    @staticmethod
+    def _insert_row(entry) -> Dict:
+        # a null id is left to the database, as the ORM does for single rows
+        return {k: v for k, v in entry.dict().items() if not (k == 'id' and v is None)}
+
+    def _batches(self, rows: List[Dict]):
+        """Yields the positions and rows of batches of at most ``bulk_batch_size`` rows setting the same columns."""
+        groups = dict()
+        for i, row in enumerate(rows):
+            groups.setdefault(tuple(row.keys()), []).append(i)
+        for positions in groups.values():
+            for start in range(0, len(positions), self.bulk_batch_size):
+                chunk = positions[start:start + self.bulk_batch_size]
+                yield chunk, [rows[i] for i in chunk]
+
+    def _select_ids(self, entry_ids: List, data_fields: Optional[List] = None):
+        for start in range(0, len(entry_ids), self.bulk_batch_size):
+            query = self._select(data_fields) if data_fields is not None else self._eager(self._select(None))
+            yield query.filter(self.model.id.in_(entry_ids[start:start + self.bulk_batch_size]))
+
+    def _update_statement(self):
+        table = self.model.__table__
+        # executemany, the SET clause is taken from the columns of the parameters
+        return table.update().where(table.c.id == bindparam('_id'))
+
+    def _update_rows(self, entries: Dict) -> List[Dict]:
+        rows = [dict(entry.dict(exclude_unset=True), _id=entry_id) for entry_id, entry in entries.items()]
+        return [row for row in rows if len(row) > 1]
+
+    def bulk_create(self, entries: List) -> List:
+        """Inserts all entries in one transaction, with multi row statements."""
+        rows = [self._insert_row(entry) for entry in entries]
+        if self._returning():
+            table = self.model.__table__
+            ret = [None] * len(rows)
+            for positions, batch in self._batches(rows):
+                for i, row in zip(positions, self.db.execute(table.insert().values(batch).returning(*table.columns))):
+                    ret[i] = row
+            self.db.commit()
+        else:
+            ids = [None] * len(rows)
+            for positions, batch in self._batches(rows):
+                for i, entry_id in zip(positions, self._insert_many(batch)):
+                    ids[i] = entry_id
+            self.db.commit()
+            loaded = {e.id: e for query in self._select_ids(ids) for e in query}
+            ret = [loaded[i] for i in ids]
+        return [self.schema.instance.from_orm(e) for e in ret]
+
+    def _insert_many(self, batch: List[Dict]) -> List:
+        """
+        Inserts a batch of rows setting the same columns, returning their ids. Rows carrying their id go in a single
+        executemany; without RETURNING, generated ids can only be read back one INSERT at a time.
+        """
+        table = self.model.__table__
+        if 'id' in batch[0]:
+            self.db.execute(table.insert(), batch)
+            return [row['id'] for row in batch]
+        return [self.db.execute(table.insert().values(row)).inserted_primary_key[0] for row in batch]
+
+    def bulk_edit(self, entries: Dict) -> List:
+        """Updates all entries in one transaction, with executemany statements."""
+        ids = list(entries.keys())
+        existing = {e[0] for query in self._select_ids(ids, ['id']) for e in query}
+        if len(existing) < len(set(ids)):
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+        for _, batch in self._batches(self._update_rows(entries)):
+            self.db.execute(self._update_statement(), batch)
+        self.db.commit()
+        loaded = {e.id: e for query in self._select_ids(ids) for e in query}
+        return [self.schema.instance.from_orm(loaded[i]) for i in ids]
+
+    def bulk_delete(self, entry_ids: List):
+        """Deletes all entries in one transaction. Runs in sql, so ORM side cascades do not apply."""
+        entry_ids = list(dict.fromkeys(entry_ids))
+        table = self.model.__table__
+        deleted = 0
+        for start in range(0, len(entry_ids), self.bulk_batch_size):
+            deleted += self.db.execute(table.delete().where(table.c.id.in_(entry_ids[start:start + self.bulk_batch_size]))).rowcount
+        if deleted < len(entry_ids):
+            self.db.rollback()
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not found")
+        self.db.commit()
+
     def count(self, data_filter: Dict = None):
         ret = self.db.query(self.model)
         ret = self._generate_filters(data_filter, ret)
@@ -35,8 +35,8 @@ class UserCrud:
     def get_schema(self):
         return self.crud.schema.instance
 
-    def use_db(self, db):
-        self.crud.use_db(db)
+    def use_db(self, db, request: bool = False):
+        self.crud.use_db(db, request)
         return self
 
     def get_user(self, user_id):
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+from enum import Enum
+from threading import Event, Thread
+from typing import Callable, Dict, Iterator
+
+from fastapi_crud_orm_connector.utils import typed_json
+
+
+class Durability(str, Enum):
+    sync = "sync"  # rewrite the whole file on every change
+    log = "log"  # append changes to a log, folded into the file in the background
+
+
+class AppendLog:
+    """Append only file of json records, rotated away while its content is compacted into the main file."""
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.rotated_path = path + '.1'
+        self.fsync = fsync
+        self.records = sum(1 for _ in self.replay())
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, record: Dict):
+        self._file.write(json.dumps(record, default=typed_json.encode) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records += 1
+
+    def replay(self) -> Iterator[Dict]:
+        """Yields the records of an interrupted compaction first, then the current ones."""
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            for i, line in enumerate(lines):
+                try:
+                    yield json.loads(line, object_hook=typed_json.decode)
+                except ValueError:
+                    if i < len(lines) - 1:
+                        raise
+                    # the last record was cut by a crash while appending it
+
+    def rotate(self):
+        """Moves the current records aside for compaction, keeping those of a previously failed one."""
+        self._file.close()
+        if os.path.exists(self.rotated_path):
+            with open(self.path, encoding='utf-8') as src, open(self.rotated_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.records = 0
+
+    def discard_rotated(self):
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        self._file.close()
+
+    def __len__(self):
+        return self.records
+
+
+class Compactor(Thread):
+    """Calls ``compact`` every ``interval`` seconds, or sooner once the log holds ``max_records`` records."""
+
+    def __init__(self, log: AppendLog, compact: Callable, interval: float = 60, max_records: int = 10000):
+        super().__init__(daemon=True)
+        self.log = log
+        self.compact = compact
+        self.interval = interval
+        self.max_records = max_records
+        self._wake = Event()
+        self._stopped = False
+
+    def notify(self):
+        if len(self.log) >= self.max_records:
+            self._wake.set()
+
+    def run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if len(self.log) > 0 and not self._stopped:
+                try:
+                    self.compact()
+                except Exception:
+                    # the records stay in the log, the next round retries
+                    logging.getLogger(__name__).exception('Compaction of %s failed', self.log.path)
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.join()
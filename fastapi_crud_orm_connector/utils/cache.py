@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread safe mapping keeping at most ``maxsize`` entries, evicting the least recently used one. With ``ttl`` the
+    entries also expire that many seconds after being set.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl if self.ttl is not None else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+
+class ExecutorStats:
+    """Calls waiting for and running in a CrudExecutor."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.max_waiting = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+
+    def enqueue(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def start(self, wait: float):
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def cancel(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def finish(self):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+
+    def dict(self) -> Dict:
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'completed': self.completed,
+            'max_waiting': self.max_waiting,
+            'wait_total': self.wait_total,
+            'wait_max': self.wait_max,
+            'wait_mean': self.wait_total / self.completed if self.completed else 0.,
+        }
+
+
+class CrudExecutor:
+    """
+    Runs the blocking calls of sync cruds in a thread pool, at most ``max_concurrency`` of them at once, so async
+    handlers keep the event loop serving while the queries run. Several executors can share one ``pool``, each
+    bounding its own crud, e.g. to the size of its connection pool.
+    """
+
+    def __init__(self, max_concurrency: int = 8, pool: ThreadPoolExecutor = None):
+        self.max_concurrency = max_concurrency
+        self.pool = pool if pool is not None else ThreadPoolExecutor(max_concurrency, thread_name_prefix='crud')
+        self.stats = ExecutorStats()
+        self._semaphore = None
+
+    async def run(self, function: Callable, *args, **kwargs):
+        if self._semaphore is None:
+            # created lazily, inside the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        start = time.perf_counter()
+        self.stats.enqueue()
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.stats.cancel()
+            raise
+        self.stats.start(time.perf_counter() - start)
+        try:
+            # the call sees the context variables of the request
+            call = functools.partial(contextvars.copy_context().run, function, *args, **kwargs)
+            return await asyncio.get_event_loop().run_in_executor(self.pool, call)
+        finally:
+            self._semaphore.release()
+            self.stats.finish()
+
+    def status(self) -> Dict:
+        return dict(self.stats.dict(), max_concurrency=self.max_concurrency)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+async def run_crud(executor: Optional[CrudExecutor], function: Callable, *args, **kwargs):
+    """
+    Calls a crud method from an async handler: async cruds are awaited, sync ones run in ``executor`` when given and
+    in the event loop otherwise, so the same handlers serve both kinds.
+    """
+    if executor is None or inspect.iscoroutinefunction(function):
+        ret = function(*args, **kwargs)
+        return await ret if inspect.isawaitable(ret) else ret
+    return await executor.run(function, *args, **kwargs)
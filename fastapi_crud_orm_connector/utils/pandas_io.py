@@ -0,0 +1,111 @@
+import os
+import tempfile
+from enum import Enum
+from typing import Iterator, List, Optional, Union
+
+import pandas as pd
+
+
+class FileFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+    feather = "feather"
+
+
+_extensions = {
+    '.csv': FileFormat.csv,
+    '.parquet': FileFormat.parquet,
+    '.pq': FileFormat.parquet,
+    '.feather': FileFormat.feather,
+    '.arrow': FileFormat.feather,
+    '.ipc': FileFormat.feather,
+}
+
+
+def detect_format(file_path: str) -> FileFormat:
+    return _extensions.get(os.path.splitext(file_path)[1].lower(), FileFormat.csv)
+
+
+def read_frame(file_path: str,
+               file_format: FileFormat = None,
+               column_id: Union[str, bool, None] = None,
+               columns: Optional[List[str]] = None,
+               ) -> pd.DataFrame:
+    """
+    Reads a dataset, loading only ``columns`` (plus ``column_id``) when given.
+    Parquet and Feather files are memory mapped, so workers reading the same file share its pages.
+    """
+    file_format = file_format or detect_format(file_path)
+    columns = _with_id(columns, column_id)
+
+    if file_format == FileFormat.csv:
+        return pd.read_csv(file_path, index_col=column_id, usecols=columns)
+
+    if file_format == FileFormat.parquet:
+        df = pd.read_parquet(file_path, engine='pyarrow', columns=columns, memory_map=True)
+    else:
+        from pyarrow import feather
+        # split_blocks keeps one block per column, allowing zero copy conversion of the mapped buffers
+        df = feather.read_table(file_path, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+    return _set_index(df, column_id)
+
+
+def iter_frames(file_path: str,
+                file_format: FileFormat = None,
+                column_id: Union[str, bool, None] = None,
+                columns: Optional[List[str]] = None,
+                chunksize: int = 100000,
+                ) -> Iterator[pd.DataFrame]:
+    """Reads a dataset as consecutive frames of at most ``chunksize`` rows, so it never has to fit in memory at once."""
+    file_format = file_format or detect_format(file_path)
+    columns = _with_id(columns, column_id)
+
+    if file_format == FileFormat.csv:
+        with pd.read_csv(file_path, index_col=column_id, usecols=columns, chunksize=chunksize) as reader:
+            yield from reader
+    elif file_format == FileFormat.parquet:
+        from pyarrow import parquet
+        source = parquet.ParquetFile(file_path, memory_map=True)
+        for batch in source.iter_batches(batch_size=chunksize, columns=columns, use_pandas_metadata=True):
+            yield _set_index(batch.to_pandas(), column_id)
+    else:
+        import pyarrow as pa
+        with pa.memory_map(file_path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(i)])
+                if columns is not None:
+                    table = table.select(columns)
+                for offset in range(0, table.num_rows, chunksize):
+                    yield _set_index(table.slice(offset, chunksize).to_pandas(), column_id)
+
+
+def _with_id(columns: Optional[List[str]], column_id: Union[str, bool, None]) -> Optional[List[str]]:
+    if columns is not None and column_id and column_id not in columns:
+        return [column_id] + list(columns)
+    return columns
+
+
+def _set_index(df: pd.DataFrame, column_id: Union[str, bool, None]) -> pd.DataFrame:
+    if column_id and column_id != df.index.name and column_id in df.columns:
+        df = df.set_index(column_id)
+    return df
+
+
+def write_frame(df: pd.DataFrame, file_path: str, file_format: FileFormat = None):
+    """Writes the dataset to a temporary file and atomically replaces ``file_path``, so mapped readers are never torn."""
+    file_format = file_format or detect_format(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        if file_format == FileFormat.csv:
+            df.to_csv(tmp_path)
+        elif file_format == FileFormat.parquet:
+            df.to_parquet(tmp_path, engine='pyarrow')
+        else:
+            # feather only stores default indexes, and uncompressed files can be mapped without decoding
+            df.reset_index().to_feather(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
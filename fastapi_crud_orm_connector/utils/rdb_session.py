@@ -1,18 +1,132 @@
+import time
+from threading import Lock
+from typing import Dict, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from fastapi_crud_orm_connector.utils.database_session import DatabaseSession
 
 Base = declarative_base()
 
 
+class PoolStats:
+    """Time spent waiting for a connection of a pool."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+
+    def record(self, wait: float, timeout: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timeout
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def dict(self) -> Dict:
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_total': self.wait_total,
+            'wait_max': self.wait_max,
+            'wait_mean': self.wait_total / self.checkouts if self.checkouts else 0.,
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool measuring how long every checkout waits for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            ret = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - start, timeout=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return ret
+
+    def recreate(self):
+        ret = super().recreate()
+        ret.stats = self.stats
+        return ret
+
+
+def pool_status(pool) -> Dict:
+    ret = {'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        ret.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if hasattr(pool, 'stats'):
+        ret.update(pool.stats.dict())
+    return ret
+
+
+def engine_args(url: str,
+                pool_size: int = 5,
+                max_overflow: int = 10,
+                pool_timeout: float = 30,
+                pool_recycle: int = -1,
+                pool_pre_ping: bool = False,
+                **kwargs) -> Dict:
+    """
+    Options of ``create_engine`` suited to the backend, merged with ``kwargs``, which take precedence. Sqlite needs
+    cross thread connections and keeps its own pool; the sizing options only apply to a QueuePool, recycling and
+    pre ping to every pool.
+    """
+    ret = dict(pool_recycle=pool_recycle, pool_pre_ping=pool_pre_ping)
+    if make_url(url).get_backend_name() == 'sqlite':
+        ret['connect_args'] = {"check_same_thread": False}
+    else:
+        ret['poolclass'] = TimedQueuePool
+    connect_args = dict(ret.get('connect_args', dict()), **kwargs.pop('connect_args', dict()))
+    ret.update(kwargs)
+    if connect_args:
+        ret['connect_args'] = connect_args
+    poolclass = ret.get('poolclass')
+    if 'pool' not in ret and isinstance(poolclass, type) and issubclass(poolclass, QueuePool):
+        for k, v in dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout).items():
+            ret.setdefault(k, v)
+    return ret
+
+
 class RDBSession(DatabaseSession):
-    def __init__(self, url):
+    """
+    Engine and sessions of a database, with an optional read replica for the routes that only read.
+    The pool options and ``kwargs`` are merged by ``engine_args``.
+    """
+
+    def __init__(self, url,
+                 replica_url: Optional[str] = None,
+                 pool_size: int = 5,
+                 max_overflow: int = 10,
+                 pool_timeout: float = 30,
+                 pool_recycle: int = -1,
+                 pool_pre_ping: bool = False,
+                 **kwargs):
         self.url = url
+        self.replica_url = replica_url
         if url is not None:
-            self.engine = create_engine(url, connect_args={"check_same_thread": False})
+            pool_args = dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout, pool_recycle=pool_recycle,
+                             pool_pre_ping=pool_pre_ping)
+            self.engine = create_engine(url, **engine_args(url, **pool_args, **kwargs))
             self.session_local = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            self.replica_engine = self.engine
+            self.replica_session_local = self.session_local
+            if replica_url is not None:
+                self.replica_engine = create_engine(replica_url, **engine_args(replica_url, **pool_args, **kwargs))
+                self.replica_session_local = sessionmaker(autocommit=False, autoflush=False, bind=self.replica_engine)
 
     def get_db(self):
         try:
@@ -23,3 +137,43 @@ class RDBSession(DatabaseSession):
                 db.close()
         except NameError as e:
             raise NameError('RDB engine not defined', e)
+
+    def get_read_db(self):
+        """Session on the read replica, or on the primary database when there is none."""
+        try:
+            db = self.replica_session_local()
+            try:
+                yield db
+            finally:
+                db.close()
+        except NameError as e:
+            raise NameError('RDB engine not defined', e)
+
+    def pool_status(self) -> Dict:
+        ret = {'primary': pool_status(self.engine.pool)}
+        if self.replica_engine is not self.engine:
+            ret['replica'] = pool_status(self.replica_engine.pool)
+        return ret
+
+
+class AsyncRDBSession(DatabaseSession):
+    """Asyncio engine and sessions for AsyncRDBCrud, the url needs an async driver (e.g. postgresql+asyncpg)."""
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        if url is not None:
+            from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+            self.engine = create_async_engine(url, **kwargs)
+            # loaded attributes must stay readable after commit, as lazy loads cannot run outside of an await
+            self.session_local = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_db(self):
+        try:
+            session_local = self.session_local
+        except AttributeError as e:
+            raise NameError('RDB engine not defined', e)
+        async with session_local() as db:
+            yield db
+
+    def pool_status(self) -> Dict:
+        return {'primary': pool_status(self.engine.sync_engine.pool)}
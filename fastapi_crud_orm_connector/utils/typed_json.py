@@ -0,0 +1,34 @@
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Dict
+
+import numpy as np
+
+# values json has no type for, written tagged with their type so they are read back as they were written
+_TYPES = {
+    'datetime': (datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    'date': (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    'time': (datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    'timedelta': (datetime.timedelta, lambda v: [v.days, v.seconds, v.microseconds], lambda v: datetime.timedelta(*v)),
+    'decimal': (Decimal, str, Decimal),
+    'uuid': (uuid.UUID, str, uuid.UUID),
+}
+
+
+def encode(value):
+    """``default`` of ``json.dumps``."""
+    if isinstance(value, np.generic):
+        return value.item()
+    # datetime before date, of which it is a subclass
+    for name, (kind, dump, _) in _TYPES.items():
+        if isinstance(value, kind):
+            return {'__type__': name, 'value': dump(value)}
+    return str(value)
+
+
+def decode(record: Dict):
+    """``object_hook`` of ``json.loads``."""
+    if len(record) == 2 and record.get('__type__') in _TYPES and 'value' in record:
+        return _TYPES[record['__type__']][2](record['value'])
+    return record